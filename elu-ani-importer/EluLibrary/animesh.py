@@ -4,20 +4,41 @@
 This module contains the primary data type (FAniMesh) to load .ani files
 """
 
+import os
+import struct
+import functools
+import collections
+import numpy
 import aniparser
+import fileprobe
+import errorhandling
 import raidflags
-import globalvars
 import binaryreader
 import commonfunctions
 from datatypes import FAniHeader
 from datatypes import FAniNode
 from datatypes import EAnimationType
+from datatypes import FParseContext
 from filelogger import FileLogger
 
 
 class FAniMesh:
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, memory_budget: int = None, normalize_rotations: bool = False,
+                 lazy: bool = False, bone_names=None,
+                 over_budget_policy: fileprobe.EMemoryBudgetPolicy = fileprobe.EMemoryBudgetPolicy.SwitchToLazy):
+        """
+        :param memory_budget: Maximum number of bytes the parsed file may take up, estimated from the file size before
+        anything is decoded (see fileprobe.estimate_ani_memory()). None for no limit.
+        :param normalize_rotations: Normalize rotation keys and keep consecutive keys in the same hemisphere, see
+        aniparser.normalize_quaternions().
+        :param lazy: Only index bone animations while loading, the key tracks of each bone are decoded on first access.
+        See aniparser.FLazyAniNode.
+        :param bone_names: Names of the bones to load, for instance the bones of the target skeleton. Bones not in it
+        are skipped over without decoding their key tracks. None loads every bone.
+        :param over_budget_policy: What to do with files over memory_budget. SwitchToLazy loads them lazily, Raise makes
+        load_and_parse_ani_file() raise errorhandling.FileTooLargeError.
+        """
         assert commonfunctions.is_valid_file_path(file_path), f"{file_path} is not a valid file path."
         assert commonfunctions.get_file_extension(file_path) == ".ani", f"{file_path} is not a .ani file type."
         self._source_file_path: str = file_path
@@ -25,6 +46,36 @@ class FAniMesh:
         self._ani_mesh_nodes = []
         self._ani_root_node = None
         self._loaded: bool = False
+        self._memory_budget = memory_budget
+        self._over_budget_policy = over_budget_policy
+        self._normalize_rotations: bool = normalize_rotations
+        self._lazy: bool = lazy
+        self._bone_names = None if bone_names is None else frozenset(bone_names)
+        # Kept open in lazy mode, shared by the nodes that are not decoded yet
+        self._ani_file_stream = None
+        self._size_listener = None
+
+    @classmethod
+    def from_parse_result(cls, result, normalize_rotations: bool = False) -> 'FAniMesh':
+        """
+        Builds a loaded FAniMesh from a batchparser.FAniParseResult, for instance one read back from meshcache, without
+        opening the ani file.
+        :param normalize_rotations: See FAniMesh. Parse results are stored without normalized rotation keys.
+        """
+        ani_mesh = cls(result.file_path, normalize_rotations=normalize_rotations)
+        ani_mesh._ani_header.signature, ani_mesh._ani_header.version = result.signature, result.version
+        ani_mesh._ani_header.max_frame, ani_mesh._ani_header.model_num = result.max_frame, result.model_num
+        ani_mesh._ani_header.ani_type = EAnimationType(result.ani_type)
+        ani_mesh._ani_mesh_nodes = result.to_ani_nodes()
+        for ani_node in ani_mesh._ani_mesh_nodes:
+            if normalize_rotations and len(ani_node.RotationKeyTrack.Keys):
+                ani_node.RotationKeyTrack.Keys = ani_node.RotationKeyTrack.Keys.copy()
+                ani_node.RotationKeyTrack.Keys['value'] = aniparser.normalize_quaternions(
+                    ani_node.RotationKeyTrack.Keys['value'])
+            if ani_mesh._ani_header.ani_type == EAnimationType.RAniType_Bone and ani_node.Name == "Bip01":
+                ani_mesh._ani_root_node = ani_node
+        ani_mesh._loaded = True
+        return ani_mesh
 
     def is_valid(self) -> bool:
         """
@@ -40,44 +91,61 @@ class FAniMesh:
         return self._loaded
 
     def load_and_parse_ani_file(self) -> None:
+        if self._memory_budget is not None:
+            estimated_size = fileprobe.estimate_ani_memory(self._source_file_path)
+            if estimated_size > self._memory_budget:
+                if self._over_budget_policy == fileprobe.EMemoryBudgetPolicy.Raise:
+                    raise errorhandling.FileTooLargeError(self._source_file_path, estimated_size, self._memory_budget)
+                self._lazy = True
         logger = FileLogger()
-        ani_file_stream = open(self._source_file_path, 'rb')
-        self._ani_header.signature = binaryreader.read_unsigned_int(ani_file_stream, 1)[0]
-        self._ani_header.version = binaryreader.read_unsigned_int(ani_file_stream, 1)[0]
-        self._ani_header.max_frame = binaryreader.read_int(ani_file_stream, 1)[0]
-        self._ani_header.model_num = binaryreader.read_int(ani_file_stream, 1)[0]
-        self._ani_header.ani_type = EAnimationType(binaryreader.read_int(ani_file_stream, 1)[0])
+        # Mapped, so that neither lazy nodes nor large vertex tables (see aniparser.LoadVertexAni()) need the whole
+        # file in memory. Everything kept after loading is copied out of the map.
+        ani_file_stream = binaryreader.FBinaryCursor.from_file(self._source_file_path, use_mmap=True)
+        try:
+            self._ani_header.signature = binaryreader.read_unsigned_int(ani_file_stream, 1)[0]
+            self._ani_header.version = binaryreader.read_unsigned_int(ani_file_stream, 1)[0]
+            self._ani_header.max_frame = binaryreader.read_int(ani_file_stream, 1)[0]
+            self._ani_header.model_num = binaryreader.read_int(ani_file_stream, 1)[0]
+            ani_type = binaryreader.read_int(ani_file_stream, 1)[0]
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, FParseContext(self._source_file_path), section="Header")
+        try:
+            self._ani_header.ani_type = EAnimationType(ani_type)
+        except ValueError as err:
+            raise errorhandling.InvalidFileError(f"Unknown animation type {ani_type}", self._source_file_path,
+                                                 section="Header") from err
 
         log_string = (f"Currently parsing .ani file: {self._source_file_path}.\n Version: {self._ani_header.version}, "
                       f"maxframe: {self._ani_header.max_frame}, type: {self._ani_header.ani_type}")
         logger.log_info(log_string)
 
-        globalvars.CurrentAniFileVersion = self._ani_header.version
+        context = FParseContext(self._source_file_path, self._ani_header.version)
+        context.NormalizeRotations = self._normalize_rotations
 
         if self._ani_header.version != raidflags.EXPORTER_CURRENT_ANI_VER:
             log_string = f"Animation data in file {self._source_file_path} is not the latest version"
             logger.log_warning(log_string)
 
-        loader_obj = None
-        if globalvars.CurrentAniFileVersion == raidflags.EXPORTER_ANI_VER12:
-            loader_obj = aniparser.FAniFileLoaderImpl_v12()
-        elif globalvars.CurrentAniFileVersion == raidflags.EXPORTER_ANI_VER11:
-            loader_obj = aniparser.FAniFileLoaderImpl_v11()
-        elif globalvars.CurrentAniFileVersion == raidflags.EXPORTER_ANI_VER9:
-            loader_obj = aniparser.FAniFileLoaderImpl_v9()
-        elif globalvars.CurrentAniFileVersion == raidflags.EXPORTER_ANI_VER8:
-            loader_obj = aniparser.FAniFileLoaderImpl_v7()
-        elif globalvars.CurrentAniFileVersion == raidflags.EXPORTER_ANI_VER7:
-            loader_obj = aniparser.FAniFileLoaderImpl_v7()
-        elif globalvars.CurrentAniFileVersion == raidflags.EXPORTER_ANI_VER6:
-            loader_obj = aniparser.FAniFileLoaderImpl_v6()
-        else:
+        loader_obj = aniparser.create_loader(context)
+        if loader_obj is None:
             log_string = (f"Animation data in file {self._source_file_path} does not match any supported versions. "
                           f"Skipping!!!")
             logger.log_error(log_string)
             return
 
+        index_bones = self._lazy or self._bone_names is not None
         for i in range(self._ani_header.model_num):
+            if index_bones and self._ani_header.ani_type == EAnimationType.RAniType_Bone:
+                ani_node = aniparser.FLazyAniNode(loader_obj, ani_file_stream, OnDecoded=self._on_node_decoded)
+                if self._bone_names is not None and ani_node.Name not in self._bone_names:
+                    continue
+                if not self._lazy:
+                    ani_node.load_tracks()
+                if ani_node.Name == "Bip01":
+                    self._ani_root_node = ani_node
+                self._ani_mesh_nodes.append(ani_node)
+                continue
+
             ani_node = FAniNode()
             if self._ani_header.ani_type == EAnimationType.RAniType_Vertex:
                 # if self.AniHeader.AniType == 1:
@@ -94,4 +162,188 @@ class FAniMesh:
             self._ani_mesh_nodes.append(ani_node)
 
         self._loaded = True
-        ani_file_stream.close()
+        if self._lazy:
+            self._ani_file_stream = ani_file_stream
+        else:
+            ani_file_stream.close()
+
+    def get_approximate_size(self) -> int:
+        """
+        :return: Rough number of bytes the parsed nodes take up in memory, used to bound FAniMeshCache.
+        """
+        # The file of a lazy mesh is memory mapped and paged in on demand, it is not counted
+        size = 0
+        for ani_node in self._ani_mesh_nodes:
+            if isinstance(ani_node, aniparser.FLazyAniNode) and not ani_node.is_decoded():
+                continue
+            size += self._get_node_size(ani_node)
+        return size
+
+    def set_size_listener(self, listener) -> None:
+        """
+        :param listener: Callable, called with the number of bytes of every lazy bone decoded from now on, so that
+        the owner of the mesh can track its size as it grows. None to stop.
+        """
+        self._size_listener = listener
+
+    def close(self) -> None:
+        """
+        Closes the file a lazy mesh keeps open. Bones that are not decoded yet can no longer be read afterwards.
+        """
+        for ani_node in self._ani_mesh_nodes:
+            if isinstance(ani_node, aniparser.FLazyAniNode):
+                ani_node.close()
+        if self._ani_file_stream is not None:
+            self._ani_file_stream.close()
+            self._ani_file_stream = None
+        self._size_listener = None
+
+    def _on_node_decoded(self, ani_node) -> None:
+        if self._size_listener is not None:
+            self._size_listener(self._get_node_size(ani_node))
+
+    @staticmethod
+    def _get_node_size(ani_node) -> int:
+        size = 0
+        for track in (ani_node.PositionKeyTrack, ani_node.RotationKeyTrack, ani_node.ScaleKeyTrack,
+                      ani_node.VisKeyTrack):
+            size += track.Keys.nbytes
+        # Memory mapped tables are paged in from the file on use and are not counted
+        if not isinstance(ani_node.VertexTable, numpy.memmap):
+            size += ani_node.VertexTable.nbytes
+        return size
+
+
+class FAniMeshCache:
+    """
+    In-process LRU cache of parsed FAniMesh objects, so that animations shared by many models (player and monster
+    animations) are only parsed once per export run. Bounded by entry count and by the approximate size of the
+    parsed nodes. Entries are keyed by path, size and modification time, so a changed file is parsed again.
+    Cached meshes are shared, callers must not modify them. Evicted meshes are closed, so a mesh must not be used
+    after later calls to get().
+    When parsed_mesh_cache is set to a meshcache.FMeshCache, meshes are read from its entries and files parsed on a
+    miss are stored in it, so that they are not parsed again in the next run. Those meshes are always fully decoded.
+    Files over memory_budget and files that fail to parse are loaded from the file itself.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 1024 ** 3, memory_budget: int = None,
+                 normalize_rotations: bool = False, lazy: bool = False):
+        """
+        :param max_entries: Maximum number of cached meshes.
+        :param max_bytes: Bound on the summed get_approximate_size() of the cached meshes, that is their decoded key
+        tracks and vertex tables. Memory mapped files and tables are not counted. The bound is checked on every get(),
+        bones a lazy mesh decodes between two calls can take the cache over it until the next one. The most recently
+        used mesh is always kept, even if it alone is larger.
+        :param memory_budget: Memory budget of every loaded FAniMesh, see FAniMesh.
+        :param normalize_rotations: Passed on to every loaded FAniMesh, see FAniMesh.
+        :param lazy: Load every FAniMesh lazily, see FAniMesh. Bones are then decoded when first used and stay decoded
+        in the cached mesh, their size is added to the entry as they are decoded.
+        """
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self.memory_budget = memory_budget
+        self.normalize_rotations: bool = normalize_rotations
+        self.lazy: bool = lazy
+        self.parsed_mesh_cache = None
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._size: int = 0
+        self._entries = collections.OrderedDict()
+
+    @staticmethod
+    def _get_key(file_path: str) -> tuple:
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        return file_path, stat.st_size, stat.st_mtime_ns
+
+    def get(self, file_path: str) -> FAniMesh:
+        """
+        :return: The parsed FAniMesh of file_path, loaded and added to the cache if it is not in there yet.
+        """
+        key = self._get_key(file_path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            # Lazy meshes grow as bones are decoded, the entry is measured again so the bound also holds on hits
+            ani_mesh, size = entry
+            new_size = ani_mesh.get_approximate_size()
+            self._entries[key] = (ani_mesh, new_size)
+            self._size += new_size - size
+            self._evict()
+            return ani_mesh
+
+        self.misses += 1
+        ani_mesh = self._load_parse_result(file_path) if self.parsed_mesh_cache is not None else None
+        if ani_mesh is None:
+            ani_mesh = FAniMesh(file_path, self.memory_budget, self.normalize_rotations, self.lazy)
+            ani_mesh.load_and_parse_ani_file()
+        size = ani_mesh.get_approximate_size()
+        self._entries[key] = (ani_mesh, size)
+        self._size += size
+        ani_mesh.set_size_listener(functools.partial(self._add_entry_size, key))
+        self._evict()
+        return ani_mesh
+
+    def _load_parse_result(self, file_path: str):
+        """
+        :return: FAniMesh built from the parsed_mesh_cache entry of file_path, parsing the file into a new entry on a
+        miss. None if the file is over memory_budget or fails to parse.
+        """
+        result = self.parsed_mesh_cache.get(file_path)
+        if self.memory_budget is not None:
+            # Cached entries hold the parsed arrays, the source file is only probed on a miss
+            if result is not None:
+                estimated_size = result.estimate_memory()
+            else:
+                estimated_size = fileprobe.estimate_ani_memory(file_path)
+            if estimated_size > self.memory_budget:
+                return None
+        if result is None:
+            result = self.parsed_mesh_cache.refresh(file_path)
+        if result.error is not None:
+            return None
+        return FAniMesh.from_parse_result(result, self.normalize_rotations)
+
+    def _add_entry_size(self, key, num_of_bytes: int) -> None:
+        # Called while a cached lazy mesh decodes a bone. Eviction waits for the next get(), the mesh may be in use.
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        self._entries[key] = (entry[0], entry[1] + num_of_bytes)
+        self._size += num_of_bytes
+
+    def _evict(self) -> None:
+        # The newest entry is always kept, even if it alone is over max_bytes
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, (ani_mesh, size) = self._entries.popitem(last=False)
+            ani_mesh.close()
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        for ani_mesh, _ in self._entries.values():
+            ani_mesh.close()
+        self._entries.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_approximate_size(self) -> int:
+        return self._size
+
+    def get_stats(self) -> dict:
+        """
+        :return: Hit/miss statistics and current size of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "approximate_bytes": self._size,
+        }
@@ -9,8 +9,8 @@
 This module contains functions for loading and verifying ani files
 """
 
-import math
 import struct
+import numpy
 import globalvars
 import errorhandling
 import datatypes
@@ -20,11 +20,112 @@ import filelogger
 from abc import ABC, abstractmethod
 
 
+# Key records of the animation tracks, as stored in the file
+VEC_KEY_RECORD_DTYPE = numpy.dtype([('value', '<f4', (3,)), ('frame', '<i4')])
+QUAT_KEY_RECORD_DTYPE = numpy.dtype([('value', '<f4', (4,)), ('frame', '<i4')])
+VIS_KEY_RECORD_DTYPE = numpy.dtype([('frame', '<i4'), ('value', '<f4')])
+# Visibility keys of files older than EXPORTER_ANI_VER5
+VIS_KEY_RECORD_DTYPE_V4 = numpy.dtype([('value', '<f4'), ('frame', '<i4')])
+# Compressed keys of version 12 files: CountType 10 keys hold three half floats, CountType 16 rotation keys hold
+# x, y, z of a unit quaternion. Both store the frame first.
+HALF_VEC_KEY_RECORD_DTYPE = numpy.dtype([('frame', '<i4'), ('value', '<u2', (3,))])
+PACKED_QUAT_KEY_RECORD_DTYPE = numpy.dtype([('frame', '<i4'), ('value', '<f4', (3,))])
+# Record size of the version 12 key tracks by CountType
+POSITION_KEY_RECORD_SIZES_V12 = {10: HALF_VEC_KEY_RECORD_DTYPE.itemsize, 16: VEC_KEY_RECORD_DTYPE.itemsize}
+ROTATION_KEY_RECORD_SIZES_V12 = {10: HALF_VEC_KEY_RECORD_DTYPE.itemsize, 16: PACKED_QUAT_KEY_RECORD_DTYPE.itemsize,
+                                 20: QUAT_KEY_RECORD_DTYPE.itemsize}
+
+# Vertex animation tables larger than this (in bytes) are memory mapped from the file instead of read into memory
+VERTEX_ANI_MEMMAP_THRESHOLD = 64 * 1024 ** 2
+
+# Attributes of FLazyAniNode that are decoded on first access
+LAZY_ANI_NODE_TRACKS = ('PositionKeyTrack', 'RotationKeyTrack', 'ScaleKeyTrack', 'VisKeyTrack')
+
+
+def get_vertex_table_shape(node) -> tuple[int, int, int]:
+    """
+    @return Returns the shape of the VertexTable of a vertex animation node, from its counts. Negative counts are
+    read as empty tables.\n
+    """
+    return max(node.VertexCount, 0), max(node.Vertex_V_Count, 0), 3
+
+
+def is_vertex_table_mapped(shape) -> bool:
+    """
+    @return Returns True if a vertex table of shape is memory mapped from the file instead of read into memory\n
+    """
+    return shape[0] * shape[1] * shape[2] * 4 > VERTEX_ANI_MEMMAP_THRESHOLD
+
+
+def read_key_track(track, file_stream, record_dtype, count, repeat_last_key=False) -> numpy.ndarray:
+    """
+    Reads count key records of record_dtype in a single read and stores them in track\n
+    @param track datatypes.FAnimationTrack to fill\n
+    @param record_dtype Structured dtype of a key record, with a 'frame' and a 'value' field\n
+    @param repeat_last_key Flag the track to play its last key twice, see datatypes.FAnimationTrack\n
+    @return Returns the records as read from file_stream\n
+    """
+    records = binaryreader.read_struct_array(file_stream, record_dtype, count)
+    track.set_keys(records['frame'], records['value'], repeat_last_key)
+    return records
+
+
+def normalize_quaternions(quats: numpy.ndarray) -> numpy.ndarray:
+    """
+    Scales quaternions to unit length and flips the sign of keys whose dot product with the previous key is
+    negative, so that interpolating consecutive keys component by component (as blender fcurves do) takes the short
+    way around. Zero length quaternions are left as they are.\n
+    @param quats Array of shape (count, 4), x, y, z, w\n
+    @return Returns a new float64 array of shape (count, 4)\n
+    """
+    quats = quats.astype(numpy.float64)
+    lengths = numpy.sqrt(numpy.einsum('ij,ij->i', quats, quats))
+    numpy.divide(quats, lengths[:, None], out=quats, where=lengths[:, None] > 0.0)
+    if len(quats) > 1:
+        dots = numpy.einsum('ij,ij->i', quats[1:], quats[:-1])
+        # Flipping a key flips its dot product with the next key as well, hence the running product
+        signs = numpy.cumprod(numpy.where(dots < 0.0, -1.0, 1.0))
+        quats[1:] *= signs[:, None]
+    return quats
+
+
+def reconstruct_quaternions(xyz: numpy.ndarray, normalize: bool = False) -> numpy.ndarray:
+    """
+    Rebuilds the W component of unit quaternions stored as x, y, z only, for a whole track at once. W is
+    sqrt(1 - x*x - y*y - z*z), or 0 if x, y, z are longer than 1.\n
+    @param xyz Array of shape (count, 3)\n
+    @param normalize Also run normalize_quaternions() on the result\n
+    @return Returns a float32 array of shape (count, 4), x, y, z, w\n
+    """
+    quats = numpy.empty((len(xyz), 4), dtype=numpy.float64)
+    quats[:, :3] = xyz
+    x, y, z = quats[:, 0], quats[:, 1], quats[:, 2]
+    length_squared = x * x + y * y + z * z
+    # NaN components compare False here and get a W of 0
+    inside = length_squared <= 1.0
+    quats[:, 3] = 0.0
+    numpy.sqrt(1.0 - length_squared, out=quats[:, 3], where=inside)
+    if normalize:
+        quats = normalize_quaternions(quats)
+    return quats.astype(numpy.float32)
+
+
 class FAniFileLoaderImpl(ABC):
 
-    def __init__(self):
+    def __init__(self, Context):
+        """
+        @param Context datatypes.FParseContext of the file that is parsed\n
+        """
         super().__init__()
+        self.Context = Context
     
+    def NormalizeRotationKeys(self, Node):
+        """
+        Runs normalize_quaternions() on the rotation keys of Node read as full quaternions, if the context asks for it
+        """
+        if self.Context.NormalizeRotations:
+            Node.RotationKeyTrack.Keys['value'] = normalize_quaternions(Node.RotationKeyTrack.Keys['value'])
+
     @abstractmethod
     def LoadVertexAni(self, Node, FileStream, Offset=None):
         pass
@@ -36,155 +137,194 @@ class FAniFileLoaderImpl(ABC):
     @abstractmethod
     def LoadVisibilityKey(self, Node, FileStream, Offset=None):
         pass
+
+    @abstractmethod
+    def IndexVertexAni(self, Node, FileStream, Offset=None):
+        pass
+
+    @abstractmethod
+    def IndexBoneAni(self, Node, FileStream, Offset=None):
+        pass
+
+    @abstractmethod
+    def IndexVisibilityKey(self, Node, FileStream, Offset=None):
+        pass
     
 
 class FAniFileLoaderImpl_v6(FAniFileLoaderImpl):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, Context):
+        super().__init__(Context)
     
     def LoadVertexAniBoundingBox(self, Node, FileStream):
-        # @todo. Skipped for now because no data is read from FileStream
+        # Versions before 7 store no bounding box
         pass
     
     def LoadVertexAni(self, Node, FileStream, Offset=None):
+        """
+        Reads a vertex animation node. VertexTable is a (VertexCount, Vertex_V_Count, 3) float32 array of the vertex
+        positions of every frame, memory mapped from the file if it is larger than VERTEX_ANI_MEMMAP_THRESHOLD.\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
         try:
             Node.Name = binaryreader.read_word(FileStream)
             Node.VertexCount = binaryreader.read_int(FileStream, 1)[0]
-            print("Vertex Count: ", Node.VertexCount)
             Node.Vertex_V_Count = binaryreader.read_int(FileStream, 1)[0]
-            print("Vertex V Count: ", Node.Vertex_V_Count)
-            # if Node.VertexCount > 0:
-            for i in range(Node.VertexCount):
-                VertFrame = binaryreader.read_unsigned_int(FileStream, 1)[0]
-                Node.VertexFrame.append(VertFrame)
-            
-            for i in range(Node.VertexCount):
-                Node.VertexTable.append([])
-                for j in range(Node.Vertex_V_Count):
-                    Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                    Node.VertexTable[i].append(Vec)
+            Shape = get_vertex_table_shape(Node)
+            Node.VertexFrame = binaryreader.read_unsigned_int_array(FileStream, Shape[0]).copy()
+
+            NumOfPoints = Shape[0] * Shape[1]
+            if is_vertex_table_mapped(Shape):
+                TableOffset = FileStream.tell()
+                # Checks that the table is in the file before mapping it
+                binaryreader.skip_bytes(FileStream, NumOfPoints * 12)
+                Node.VertexTable = numpy.memmap(self.Context.FilePath, dtype='<f4', mode='r', offset=TableOffset,
+                                                shape=Shape)
+            else:
+                Node.VertexTable = binaryreader.read_float_array(FileStream, NumOfPoints, 3).reshape(Shape).copy()
 
             self.LoadVertexAniBoundingBox(Node, FileStream)
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VertexAni', FileStream.tell())
+
+    def IndexVertexAni(self, Node, FileStream, Offset=None):
+        """
+        Reads the name, counts and bounding box of a vertex animation node to Node and skips over its tables\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
+        try:
+            Node.Name = binaryreader.read_word(FileStream)
+            Node.VertexCount = binaryreader.read_int(FileStream, 1)[0]
+            Node.Vertex_V_Count = binaryreader.read_int(FileStream, 1)[0]
+            Shape = get_vertex_table_shape(Node)
+            binaryreader.skip_bytes(FileStream, Shape[0] * 4 + Shape[0] * Shape[1] * 12)
+            self.LoadVertexAniBoundingBox(Node, FileStream)
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VertexAni', FileStream.tell())
     
     def LoadBoneAni(self, Node, FileStream, Offset=None):
+        if Offset is not None:
+            FileStream.seek(Offset)
         try:
             Node.Name = binaryreader.read_word(FileStream)
-            if globalvars.CurrentAniFileVersion >= raidflags.EXPORTER_ANI_VER6:
+            if self.Context.Version >= raidflags.EXPORTER_ANI_VER6:
                 Node.ParentName = binaryreader.read_word(FileStream)
 
             Node.LocalMatrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
 
             PosKeyNum = binaryreader.read_int(FileStream, 1)[0]
             if PosKeyNum:
-                Node.PositionKeyTrack.Count = PosKeyNum + 1
-                for i in range(PosKeyNum):
-                    PosKey = datatypes.FVecKey()
-                    PosKey.Vector = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                    PosKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    Node.PositionKeyTrack.Data.append(PosKey)
-                LastPosKey = Node.PositionKeyTrack.Data[PosKeyNum - 1]
-                Node.PositionKeyTrack.Data.append(LastPosKey)
+                read_key_track(Node.PositionKeyTrack, FileStream, VEC_KEY_RECORD_DTYPE, PosKeyNum, True)
 
             RotKeyNum = binaryreader.read_int(FileStream, 1)[0]
             if RotKeyNum:
-                Node.RotationKeyTrack.Count = RotKeyNum + 1
-                for i in range(RotKeyNum):
-                    QuatKey = datatypes.FQuatKey()
-                    QuatKey.Quat = datatypes.FQuaternion(binaryreader.read_float(FileStream, 4))
-                    QuatKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    Node.RotationKeyTrack.Data.append(QuatKey)
-                LastQuatKey = Node.RotationKeyTrack.Data[RotKeyNum - 1]
-                Node.RotationKeyTrack.Data.append(LastQuatKey)
-
-            if globalvars.CurrentAniFileVersion >= raidflags.EXPORTER_ANI_VER5:
+                read_key_track(Node.RotationKeyTrack, FileStream, QUAT_KEY_RECORD_DTYPE, RotKeyNum, True)
+                self.NormalizeRotationKeys(Node)
+
+            if self.Context.Version >= raidflags.EXPORTER_ANI_VER5:
                 ScaleCount = binaryreader.read_int(FileStream, 1)[0]
                 if ScaleCount:
-                    Node.ScaleKeyTrack.Count = ScaleCount
-                    for i in range(ScaleCount):
-                        ScaleKey = datatypes.FVecKey()
-                        ScaleKey.Vector = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                        ScaleKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                        Node.ScaleKeyTrack.Data.append(ScaleKey)
+                    read_key_track(Node.ScaleKeyTrack, FileStream, VEC_KEY_RECORD_DTYPE, ScaleCount)
 
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'BoneAni', FileStream.tell())
         
     def LoadVisibilityKey(self, Node, FileStream, Offset=None):
         try:
-            if globalvars.CurrentAniFileVersion >= raidflags.EXPORTER_ANI_VER5:
-                VisCount = binaryreader.read_int(FileStream, 1)[0]
-                Node.VisKeyTrack.Count = VisCount
-                if VisCount:
-                    for i in range(VisCount):
-                        VisKey = datatypes.FVisKey()
-                        VisKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                        VisKey.Vis = binaryreader.read_float(FileStream, 1)[0]
-                        if VisKey.Vis < 0.0:
-                            VisKey.Vis = 0.0
-                        Node.VisKeyTrack.Data.append(VisKey)
-                    return True
+            if self.Context.Version >= raidflags.EXPORTER_ANI_VER5:
+                RecordDtype = VIS_KEY_RECORD_DTYPE
             else:
-                VisCount = binaryreader.read_int(FileStream, 1)[0]
-                Node.VisKeyTrack.Count = VisCount
-                if VisCount:
-                    for i in range(VisCount):
-                        VisKey = datatypes.FVisKey()
-                        VisKey.Vis = binaryreader.read_float(FileStream, 1)[0]
-                        if VisKey.Vis < 0.0:
-                            VisKey.Vis = 0.0
-                        VisKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                        Node.VisKeyTrack.Data.append(VisKey)
-                    return True            
+                RecordDtype = VIS_KEY_RECORD_DTYPE_V4
+            VisCount = binaryreader.read_int(FileStream, 1)[0]
+            if VisCount:
+                Records = read_key_track(Node.VisKeyTrack, FileStream, RecordDtype, VisCount)
+                Node.VisKeyTrack.Keys['value'] = numpy.maximum(Records['value'], 0.0)
+                return True
             return False
 
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VisibilityKey',
+                                                     FileStream.tell())
+
+    def IndexBoneAni(self, Node, FileStream, Offset=None):
+        """
+        Reads the names and the local matrix of a bone to Node and skips over its key tracks, without decoding them.\n
+        @return Returns the offset of the bone in FileStream, to pass to LoadBoneAni() later on\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
+        BoneOffset = FileStream.tell()
+        try:
+            Node.Name = binaryreader.read_word(FileStream)
+            if self.Context.Version >= raidflags.EXPORTER_ANI_VER6:
+                Node.ParentName = binaryreader.read_word(FileStream)
+            Node.LocalMatrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
+
+            RecordSizes = [VEC_KEY_RECORD_DTYPE.itemsize, QUAT_KEY_RECORD_DTYPE.itemsize]
+            if self.Context.Version >= raidflags.EXPORTER_ANI_VER5:
+                RecordSizes.append(VEC_KEY_RECORD_DTYPE.itemsize)
+            for RecordSize in RecordSizes:
+                KeyNum = binaryreader.read_int(FileStream, 1)[0]
+                binaryreader.skip_bytes(FileStream, KeyNum * RecordSize)
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'BoneAni', FileStream.tell())
+        return BoneOffset
+
+    def IndexVisibilityKey(self, Node, FileStream, Offset=None):
+        """
+        Skips over the visibility keys of a node, see IndexBoneAni()\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
+        try:
+            VisCount = binaryreader.read_int(FileStream, 1)[0]
+            binaryreader.skip_bytes(FileStream, VisCount * VIS_KEY_RECORD_DTYPE.itemsize)
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VisibilityKey',
+                                                     FileStream.tell())
 
 
 class FAniFileLoaderImpl_v7(FAniFileLoaderImpl_v6):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, Context):
+        super().__init__(Context)
     
     def LoadVertexAniBoundingBox(self, Node, FileStream):
         try:
-            Node.BoundingBox.vmin = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-            Node.BoundingBox.vmax = datatypes.FVector(binaryreader.read_float(FileStream, 3))
+            Values = binaryreader.read_float(FileStream, 6)
+            Node.BoundingBox = datatypes.FBoundingBox(datatypes.FVector(Values[:3]), datatypes.FVector(Values[3:]))
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VertexAni', FileStream.tell())
 
 
 class FAniFileLoaderImpl_v9(FAniFileLoaderImpl_v7):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, Context):
+        super().__init__(Context)
 
     def LoadVisibilityKey(self, Node, FileStream, Offset=None):
         try:
             VisCount = binaryreader.read_int(FileStream, 1)[0]
             if VisCount:
-                Node.VisKeyTrack.Count = VisCount
-                for i in range(VisCount):
-                    VisKey = datatypes.FVisKey()
-                    VisKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    VisKey.Vis = binaryreader.read_float(FileStream, 1)[0]
-                    Node.VisKeyTrack.Data.append(VisKey)
+                read_key_track(Node.VisKeyTrack, FileStream, VIS_KEY_RECORD_DTYPE, VisCount)
                 return True
             return False
 
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VisibilityKey',
+                                                     FileStream.tell())
 
 
 class FAniFileLoaderImpl_v11(FAniFileLoaderImpl_v9):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, Context):
+        super().__init__(Context)
 
     def LoadBoneAni(self, Node, FileStream, Offset=None):
+        if Offset is not None:
+            FileStream.seek(Offset)
         try:
             Node.Name = binaryreader.read_word(FileStream)
             Node.ParentName = binaryreader.read_word(FileStream)
@@ -192,59 +332,66 @@ class FAniFileLoaderImpl_v11(FAniFileLoaderImpl_v9):
             
             AnimType_1 = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType_1.Count > 0:
-                Node.PositionKeyTrack.Count = AnimType_1.Count + 1
-                for i in range(AnimType_1.Count):
-                    PosKey = datatypes.FVecKey()
-                    PosKey.Vector = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                    PosKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    Node.PositionKeyTrack.Data.append(PosKey)
-                LastPosKey = Node.PositionKeyTrack.Data[AnimType_1.Count - 1]
-                Node.PositionKeyTrack.Data.append(LastPosKey)
+                read_key_track(Node.PositionKeyTrack, FileStream, VEC_KEY_RECORD_DTYPE, AnimType_1.Count, True)
             
             AnimType_2 = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType_2.Count > 0:
-                Node.RotationKeyTrack.Count = AnimType_2.Count + 1
-                for i in range(AnimType_2.Count):
-                    QuatKey = datatypes.FQuatKey()
-                    QuatKey.Quat = datatypes.FQuaternion(binaryreader.read_float(FileStream, 4))
-                    QuatKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    Node.RotationKeyTrack.Data.append(QuatKey)
-                LastQuatKey = Node.RotationKeyTrack.Data[AnimType_2.Count - 1]
-                Node.RotationKeyTrack.Data.append(LastQuatKey)
+                read_key_track(Node.RotationKeyTrack, FileStream, QUAT_KEY_RECORD_DTYPE, AnimType_2.Count, True)
+                self.NormalizeRotationKeys(Node)
 
             AnimType_3 = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType_3.Count > 0:
-                Node.ScaleKeyTrack.Count = AnimType_3.Count
-                for i in range(AnimType_3.Count):
-                    ScaleKey = datatypes.FVecKey()
-                    ScaleKey.Vector = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                    ScaleKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    Node.ScaleKeyTrack.Data.append(ScaleKey)
+                read_key_track(Node.ScaleKeyTrack, FileStream, VEC_KEY_RECORD_DTYPE, AnimType_3.Count)
 
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'BoneAni', FileStream.tell())
         
     def LoadVisibilityKey(self, Node, FileStream, Offset=None):
         try:
             AnimType = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType.Count > 0:
-                Node.VisKeyTrack.Count = AnimType.Count
-                for i in range(AnimType.Count):
-                    VisKey = datatypes.FVisKey()
-                    VisKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    VisKey.Vis = binaryreader.read_float(FileStream, 1)[0]
-                    Node.VisKeyTrack.Data.append(VisKey)
+                read_key_track(Node.VisKeyTrack, FileStream, VIS_KEY_RECORD_DTYPE, AnimType.Count)
+
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VisibilityKey',
+                                                     FileStream.tell())
+
+    def IndexBoneAni(self, Node, FileStream, Offset=None):
+        if Offset is not None:
+            FileStream.seek(Offset)
+        BoneOffset = FileStream.tell()
+        try:
+            Node.Name = binaryreader.read_word(FileStream)
+            Node.ParentName = binaryreader.read_word(FileStream)
+            Node.LocalMatrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
 
+            for RecordSize in (VEC_KEY_RECORD_DTYPE.itemsize, QUAT_KEY_RECORD_DTYPE.itemsize,
+                               VEC_KEY_RECORD_DTYPE.itemsize):
+                AnimType = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
+                binaryreader.skip_bytes(FileStream, max(AnimType.Count, 0) * RecordSize)
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'BoneAni', FileStream.tell())
+        return BoneOffset
+
+    def IndexVisibilityKey(self, Node, FileStream, Offset=None):
+        if Offset is not None:
+            FileStream.seek(Offset)
+        try:
+            AnimType = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
+            binaryreader.skip_bytes(FileStream, max(AnimType.Count, 0) * VIS_KEY_RECORD_DTYPE.itemsize)
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'VisibilityKey',
+                                                     FileStream.tell())
 
 
 class FAniFileLoaderImpl_v12(FAniFileLoaderImpl_v11):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, Context):
+        super().__init__(Context)
 
     def LoadBoneAni(self, Node, FileStream, Offset=None):
+        if Offset is not None:
+            FileStream.seek(Offset)
         try:
             Node.Name = binaryreader.read_word(FileStream)
             
@@ -254,26 +401,12 @@ class FAniFileLoaderImpl_v12(FAniFileLoaderImpl_v11):
 
             AnimType_1 = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType_1.Count > 0:
-                Node.PositionKeyTrack.Count = AnimType_1.Count + 1
                 if AnimType_1.CountType == 10:
-                    for i in range(AnimType_1.Count):
-                        Frame = binaryreader.read_int(FileStream, 1)[0]
-                        ShortTuple = binaryreader.read_unsigned_short(FileStream, 3)
-                        FloatTuple = datatypes.convert_short_to_float(ShortTuple)
-                        PosKey = datatypes.FVecKey()
-                        PosKey.Frame = Frame
-                        PosKey.Vector = datatypes.FVector(FloatTuple)
-                        Node.PositionKeyTrack.Data.append(PosKey)
-                    LastPosKey = Node.PositionKeyTrack.Data[AnimType_1.Count - 1]
-                    Node.PositionKeyTrack.Data.append(LastPosKey)
+                    Records = binaryreader.read_struct_array(FileStream, HALF_VEC_KEY_RECORD_DTYPE, AnimType_1.Count)
+                    Node.PositionKeyTrack.set_keys(Records['frame'],
+                                                   datatypes.convert_short_array_to_float(Records['value']), True)
                 elif AnimType_1.CountType == 16:
-                    for i in range(AnimType_1.Count):
-                        PosKey = datatypes.FVecKey()
-                        PosKey.Vector = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                        PosKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                        Node.PositionKeyTrack.Data.append(PosKey)
-                    LastPosKey = Node.PositionKeyTrack.Data[AnimType_1.Count - 1]
-                    Node.PositionKeyTrack.Data.append(LastPosKey)
+                    read_key_track(Node.PositionKeyTrack, FileStream, VEC_KEY_RECORD_DTYPE, AnimType_1.Count, True)
                 else:
                     Message = "{0} node error: RAnimType_1.CountType is incorrect.".format(Node.Name)
                     filelogger.add_log(globalvars.LogFileStream, Message, filelogger.ELogMessageType.Log_Error)
@@ -281,48 +414,18 @@ class FAniFileLoaderImpl_v12(FAniFileLoaderImpl_v11):
             
             AnimType_2 = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType_2.Count > 0:
-                Node.RotationKeyTrack.Count = AnimType_2.Count + 1
                 if AnimType_2.CountType == 10:
-                    for i in range(AnimType_2.Count):
-                        Frame = binaryreader.read_int(FileStream, 1)[0]
-                        ShortTuple = binaryreader.read_unsigned_short(FileStream, 3)
-                        X, Y, Z = datatypes.convert_short_to_float(ShortTuple)
-                        W = 0
-                        FTol = X * X + Y * Y + Z * Z
-                        if FTol <= 1.0:
-                            Sub1 = 1.0 - FTol
-                            FSqrt = math.sqrt(Sub1)
-                            W = FSqrt
-                        QuatKey = datatypes.FQuatKey()
-                        QuatKey.Frame = Frame
-                        QuatKey.Quat = datatypes.FQuaternion((X, Y, Z, W))
-                        Node.RotationKeyTrack.Data.append(QuatKey)
-                    LastQuatKey = Node.RotationKeyTrack.Data[AnimType_2.Count - 1]
-                    Node.RotationKeyTrack.Data.append(LastQuatKey)
+                    Records = binaryreader.read_struct_array(FileStream, HALF_VEC_KEY_RECORD_DTYPE, AnimType_2.Count)
+                    Values = reconstruct_quaternions(datatypes.convert_short_array_to_float(Records['value']),
+                                                     self.Context.NormalizeRotations)
+                    Node.RotationKeyTrack.set_keys(Records['frame'], Values, True)
                 elif AnimType_2.CountType == 16:
-                    for i in range(AnimType_2.Count):
-                        Frame = binaryreader.read_int(FileStream, 1)[0]
-                        X, Y, Z = binaryreader.read_float(FileStream, 3)
-                        W = 0
-                        FTol = X * X + Y * Y + Z * Z
-                        if FTol <= 1.0:
-                            Sub1 = 1.0 - FTol
-                            FSqrt = math.sqrt(Sub1)
-                            W = FSqrt
-                        QuatKey = datatypes.FQuatKey()
-                        QuatKey.Frame = Frame
-                        QuatKey.Quat = datatypes.FQuaternion((X, Y, Z, W))
-                        Node.RotationKeyTrack.Data.append(QuatKey)
-                    LastQuatKey = Node.RotationKeyTrack.Data[AnimType_2.Count - 1]
-                    Node.RotationKeyTrack.Data.append(LastQuatKey)
+                    Records = binaryreader.read_struct_array(FileStream, PACKED_QUAT_KEY_RECORD_DTYPE, AnimType_2.Count)
+                    Values = reconstruct_quaternions(Records['value'], self.Context.NormalizeRotations)
+                    Node.RotationKeyTrack.set_keys(Records['frame'], Values, True)
                 elif AnimType_2.CountType == 20:
-                    for i in range(AnimType_2.Count):
-                        QuatKey = datatypes.FQuatKey()
-                        QuatKey.Quat = datatypes.FQuaternion(binaryreader.read_float(FileStream, 4))
-                        QuatKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                        Node.RotationKeyTrack.Data.append(QuatKey)
-                    LastQuatKey = Node.RotationKeyTrack.Data[AnimType_2.Count - 1]
-                    Node.RotationKeyTrack.Data.append(LastQuatKey)
+                    read_key_track(Node.RotationKeyTrack, FileStream, QUAT_KEY_RECORD_DTYPE, AnimType_2.Count, True)
+                    self.NormalizeRotationKeys(Node)
                 else:
                     Message = "{0} node error: RAnimType_2.CountType is incorrect.".format(Node.Name)
                     filelogger.add_log(globalvars.LogFileStream, Message, filelogger.ELogMessageType.Log_Error)
@@ -330,12 +433,112 @@ class FAniFileLoaderImpl_v12(FAniFileLoaderImpl_v11):
 
             AnimType_3 = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
             if AnimType_3.Count > 0:
-                Node.ScaleKeyTrack.Count = AnimType_3.Count
-                for i in range(AnimType_3.Count):
-                    ScaleKey = datatypes.FVecKey()
-                    ScaleKey.Vector = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                    ScaleKey.Frame = binaryreader.read_int(FileStream, 1)[0]
-                    Node.ScaleKeyTrack.Data.append(ScaleKey)
+                read_key_track(Node.ScaleKeyTrack, FileStream, VEC_KEY_RECORD_DTYPE, AnimType_3.Count)
+
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'BoneAni', FileStream.tell())
+
+    def IndexBoneAni(self, Node, FileStream, Offset=None):
+        if Offset is not None:
+            FileStream.seek(Offset)
+        BoneOffset = FileStream.tell()
+        try:
+            Node.Name = binaryreader.read_word(FileStream)
+
+            Node.BaseTranslation = datatypes.FVector(binaryreader.read_float(FileStream, 3))
+            Node.BaseRotation = datatypes.FQuaternion(binaryreader.read_float(FileStream, 4))
+            Node.BaseScale = datatypes.FVector(binaryreader.read_int(FileStream, 3))
 
+            for RecordSizes in (POSITION_KEY_RECORD_SIZES_V12, ROTATION_KEY_RECORD_SIZES_V12):
+                AnimType = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
+                if AnimType.Count > 0:
+                    if AnimType.CountType not in RecordSizes:
+                        # LoadBoneAni() logs the error and stops reading the bone at the same offset
+                        return BoneOffset
+                    binaryreader.skip_bytes(FileStream, AnimType.Count * RecordSizes[AnimType.CountType])
+
+            AnimType = datatypes.FAnimType(binaryreader.read_int(FileStream, 3))
+            binaryreader.skip_bytes(FileStream, max(AnimType.Count, 0) * VEC_KEY_RECORD_DTYPE.itemsize)
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.Name, 'BoneAni', FileStream.tell())
+        return BoneOffset
+
+
+class FLazyAniNode(datatypes.FAniNode):
+    """
+    Bone ani node that is indexed on creation and decodes its key tracks from FileStream on first access.\n
+    Names, matrices and base transforms are available right away.\n
+    """
+
+    def __init__(self, Loader, FileStream, Offset=None, OnDecoded=None):
+        """
+        @param OnDecoded Optional callable, called with the node once its tracks are decoded\n
+        """
+        super().__init__()
+        self._loader = Loader
+        self._file_stream = FileStream
+        self._on_decoded = OnDecoded
+        # Tracks are removed from the instance, so that reading them ends up in __getattr__
+        self._defaults = {Attr: self.__dict__.pop(Attr) for Attr in LAZY_ANI_NODE_TRACKS}
+        self._pending: bool = True
+        self.Offset = Loader.IndexBoneAni(self, FileStream, Offset)
+        Loader.IndexVisibilityKey(self, FileStream)
+
+    def __getattr__(self, Name):
+        # Only called for attributes that are not set, which are the tracks while they are not decoded yet
+        if Name not in LAZY_ANI_NODE_TRACKS or '_loader' not in self.__dict__:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, Name))
+        if self._loader is None:
+            raise AttributeError("'{0}' of node {1} was not decoded before its file was closed".format(Name, self.Name))
+        self.load_tracks()
+        return self.__dict__[Name]
+
+    def is_decoded(self) -> bool:
+        return not self._pending
+
+    def load_tracks(self) -> None:
+        """
+        Decodes the key tracks, if they are not decoded yet\n
+        """
+        if not self._pending:
+            return
+        self._pending = False
+        for Attr in LAZY_ANI_NODE_TRACKS:
+            setattr(self, Attr, self._defaults[Attr])
+
+        # The stream is shared with the mesh and other nodes, leave its cursor where it was
+        Position = self._file_stream.tell()
+        self._loader.LoadBoneAni(self, self._file_stream, self.Offset)
+        self._loader.LoadVisibilityKey(self, self._file_stream)
+        self._file_stream.seek(Position)
+        if self._on_decoded is not None:
+            self._on_decoded(self)
+
+    def close(self) -> None:
+        """
+        Drops the file stream. Tracks that are not decoded yet can no longer be read afterwards.\n
+        """
+        self._loader = None
+        self._file_stream = None
+        self._on_decoded = None
+
+
+ANI_LOADERS = {
+    raidflags.EXPORTER_ANI_VER12: FAniFileLoaderImpl_v12,
+    raidflags.EXPORTER_ANI_VER11: FAniFileLoaderImpl_v11,
+    raidflags.EXPORTER_ANI_VER9: FAniFileLoaderImpl_v9,
+    raidflags.EXPORTER_ANI_VER8: FAniFileLoaderImpl_v7,
+    raidflags.EXPORTER_ANI_VER7: FAniFileLoaderImpl_v7,
+    raidflags.EXPORTER_ANI_VER6: FAniFileLoaderImpl_v6,
+}
+
+
+def create_loader(Context):
+    """
+    @param Context datatypes.FParseContext of the file that is parsed\n
+    @return Returns the loader for the ani version of Context, None if the version is not supported\n
+    """
+    LoaderClass = ANI_LOADERS.get(Context.Version)
+    if LoaderClass is None:
+        return None
+    return LoaderClass(Context)
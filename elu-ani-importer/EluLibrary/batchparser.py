@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+"""
+This module contains functions to parse many .elu and .ani files in parallel worker processes.\n
+Workers send back compact, picklable results (numpy arrays plus small metadata) instead of FEluNode/FAniNode objects,
+so that results are cheap to transfer between processes.
+"""
+
+import os
+import numpy
+import binaryreader
+import commonfunctions
+import eluparser
+import fileprobe
+from concurrent.futures import ProcessPoolExecutor
+from elumesh import FEluMesh
+from animesh import FAniMesh
+from datatypes import FEluNode
+from datatypes import FAniNode
+from datatypes import FBoundingBox
+from datatypes import FParseContext
+from datatypes import FMatrix
+from datatypes import FVector
+from datatypes import FQuaternion
+from datatypes import RMeshAlign
+
+
+# FEluNode attributes that are copied into results as they are
+ELU_NODE_ARRAYS = ('Points', 'Normals', 'TangentTans', 'TangentBins', 'TexCoords', 'TexCoordsExtra',
+                   'PolygonOffsets', 'PolygonCorners', 'PolygonMaterialIDs', 'PointColors',
+                   'PhysiqueData', 'PhysiqueSizes', 'PhysiqueNums',
+                   'BoneTableIndices', 'VertexIndices', 'FaceIndexTable', 'MaterialInfos')
+
+ELU_NODE_SCALARS = ('NodeName', 'NodeParentName', 'ParentNodeID', 'dwFlag', 'BaseVisibility', 'LODProjectIndex',
+                    'PointsCount', 'NormalsCount', 'TangentTanCount', 'TangentBinCount', 'TexCoordCount',
+                    'TexCoordExtraCount', 'FaceCount', 'TotalDegrees', 'TotalTriangles', 'PointColorCount',
+                    'MaterialID', 'PhysiqueCount', 'BoneCount', 'VertexIndexCount', 'FaceIndexCount',
+                    'MaterialInfoCount', 'BoundingBoxMatchesStored')
+
+ANI_NODE_TRACKS = ('PositionKeyTrack', 'RotationKeyTrack', 'ScaleKeyTrack', 'VisKeyTrack')
+
+
+class FEluParseResult:
+    """
+    Parsed content of an elu file. Each node is a dict of FEluNode attribute name -> scalar or numpy array.
+    LocalMatrix is a 16 float tuple, BoneTable a (BoneCount, 16) float32 array, BoundingBox and StoredBoundingBox
+    (vmin, vmax) pairs of 3 float tuples or None.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path: str = file_path
+        self.error = None
+        self.signature: int = 0
+        self.version: int = 0
+        self.material_num: int = 0
+        self.mesh_num: int = 0
+        self.nodes: list[dict] = []
+
+    def estimate_memory(self) -> int:
+        """
+        @return Returns the estimate of fileprobe.estimate_elu_memory() for the parsed file, from the counts stored in
+        the nodes, without reading the file\n
+        """
+        return fileprobe.estimate_elu_nodes_memory(self.nodes)
+
+    def to_elu_nodes(self) -> list[FEluNode]:
+        """
+        Rebuilds FEluNode objects from the result, for code that works on nodes
+        """
+        elu_nodes = []
+        for node_data in self.nodes:
+            elu_node = FEluNode()
+            for name in ELU_NODE_SCALARS + ELU_NODE_ARRAYS:
+                setattr(elu_node, name, node_data[name])
+            elu_node.MeshAlign = RMeshAlign(node_data['MeshAlign'])
+            if node_data['LocalMatrix'] is not None:
+                elu_node.LocalMatrix = FMatrix(node_data['LocalMatrix'])
+            elu_node.BoneTable = [FMatrix(matrix) for matrix in node_data['BoneTable'].tolist()]
+            elu_node.BoundingBox = _make_bounding_box(node_data['BoundingBox']) or FBoundingBox()
+            elu_node.StoredBoundingBox = _make_bounding_box(node_data['StoredBoundingBox'])
+            elu_nodes.append(elu_node)
+        return elu_nodes
+
+
+class FAniParseResult:
+    """
+    Parsed content of an ani file. Each node is a dict holding its names, matrices and key tracks. Key tracks are
+    arrays of datatypes.KEY_TRACK_DTYPES records, with the same keys as FAnimationTrack.get_keys().
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path: str = file_path
+        self.error = None
+        self.signature: int = 0
+        self.version: int = 0
+        self.max_frame: int = 0
+        self.model_num: int = 0
+        self.ani_type: int = 0
+        self.nodes: list[dict] = []
+
+    def estimate_memory(self) -> int:
+        """
+        @return Returns the number of bytes the key tracks and vertex tables of the nodes take up\n
+        """
+        return sum(value.nbytes for node_data in self.nodes for value in node_data.values()
+                   if isinstance(value, numpy.ndarray))
+
+    def to_ani_nodes(self) -> list[FAniNode]:
+        """
+        Rebuilds FAniNode objects from the result, for code that works on nodes. The repeated last keys are stored in
+        the key arrays, so RepeatLastKey is never set on the rebuilt tracks, get_keys() returns the same keys.
+        """
+        ani_nodes = []
+        for node_data in self.nodes:
+            ani_node = FAniNode()
+            ani_node.Name = node_data['Name']
+            ani_node.ParentName = node_data['ParentName']
+            if node_data['LocalMatrix'] is not None:
+                ani_node.LocalMatrix = FMatrix(node_data['LocalMatrix'])
+            ani_node.BaseTranslation = _make_vector(node_data['BaseTranslation'])
+            ani_node.BaseRotation = _make_vector(node_data['BaseRotation'], FQuaternion)
+            ani_node.BaseScale = _make_vector(node_data['BaseScale'])
+            for name in ANI_NODE_TRACKS:
+                getattr(ani_node, name).Keys = node_data[name]
+            ani_node.VertexFrame = node_data['VertexFrame']
+            ani_node.VertexTable = node_data['VertexTable']
+            ani_node.VertexCount, ani_node.Vertex_V_Count = ani_node.VertexTable.shape[:2]
+            ani_node.BoundingBox = _make_bounding_box(node_data['BoundingBox']) or FBoundingBox()
+            ani_nodes.append(ani_node)
+        return ani_nodes
+
+
+def _flatten_matrix(matrix):
+    if matrix is None:
+        return None
+    return tuple(value for row in matrix.get_matrix_as_tuples() for value in row)
+
+
+def _vector_values(vector, components):
+    if vector is None:
+        return None
+    values = (vector.X, vector.Y, vector.Z, vector.W) if components == 4 else (vector.X, vector.Y, vector.Z)
+    return tuple(float(value) for value in values)
+
+
+def _bounding_box_values(bounding_box):
+    if bounding_box is None or bounding_box.is_empty():
+        return None
+    return _vector_values(bounding_box.vmin, 3), _vector_values(bounding_box.vmax, 3)
+
+
+def _make_vector(values, vector_type=FVector):
+    if values is None:
+        return None
+    return vector_type(values)
+
+
+def _make_bounding_box(values):
+    if values is None:
+        return None
+    return FBoundingBox(*[FVector(vector_values) for vector_values in values])
+
+
+def _key_track_array(track):
+    return numpy.array(track.get_keys())
+
+
+def _elu_node_data(elu_node: FEluNode) -> dict:
+    node_data = {name: getattr(elu_node, name) for name in ELU_NODE_SCALARS}
+    for name in ELU_NODE_ARRAYS:
+        # Arrays may be views of the file buffer, copies keep the buffer from being pickled whole
+        node_data[name] = numpy.array(getattr(elu_node, name))
+    node_data['MeshAlign'] = elu_node.MeshAlign.value
+    node_data['LocalMatrix'] = _flatten_matrix(elu_node.LocalMatrix)
+    bone_matrices = [_flatten_matrix(matrix) for matrix in elu_node.BoneTable]
+    node_data['BoneTable'] = numpy.array(bone_matrices, dtype=numpy.float32).reshape(-1, 16)
+    node_data['BoundingBox'] = _bounding_box_values(elu_node.BoundingBox)
+    node_data['StoredBoundingBox'] = _bounding_box_values(elu_node.StoredBoundingBox)
+    return node_data
+
+
+def parse_elu_file(file_path: str) -> FEluParseResult:
+    result = FEluParseResult(file_path)
+    elu_mesh = FEluMesh(file_path)
+    header = elu_mesh.EluHeader
+    result.signature, result.version = header.Signature, header.Version
+    result.material_num, result.mesh_num = header.MaterialNum, header.MeshNum
+    for elu_node in elu_mesh.EluMeshNodes:
+        result.nodes.append(_elu_node_data(elu_node))
+    elu_mesh.EluFileStream.close()
+    return result
+
+
+def parse_elu_nodes(file_path: str, version: int, node_offsets) -> list[dict]:
+    """
+    Decodes the elu nodes starting at node_offsets. Runs inside the worker processes of parse_elu_file_parallel().\n
+    The file is memory mapped, so every worker only reads the part of the file its nodes are stored in.\n
+    @return Returns the node dicts, in the order of node_offsets\n
+    """
+    loader = eluparser.create_node_loader(FParseContext(file_path, version))
+    nodes = []
+    with binaryreader.FBinaryCursor.from_file(file_path, use_mmap=True) as file_stream:
+        for node_offset in node_offsets:
+            elu_node = FEluNode()
+            loader.Load(elu_node, file_stream, node_offset)
+            nodes.append(_elu_node_data(elu_node))
+    return nodes
+
+
+def _split_node_offsets(probe, num_of_chunks: int) -> list[list[int]]:
+    """
+    Splits the nodes of probe into runs of adjacent nodes holding about the same number of bytes
+    """
+    node_offsets = [node.Offset for node in probe.nodes]
+    node_ends = node_offsets[1:] + [probe.end_offset]
+    chunk_size = max(1, (probe.end_offset - node_offsets[0]) // num_of_chunks)
+    chunks = [[]]
+    chunk_bytes = 0
+    for node_offset, node_end in zip(node_offsets, node_ends):
+        if chunk_bytes >= chunk_size:
+            chunks.append([])
+            chunk_bytes = 0
+        chunks[-1].append(node_offset)
+        chunk_bytes += node_end - node_offset
+    return chunks
+
+
+def parse_elu_file_parallel(file_path: str, workers: int = None) -> FEluParseResult:
+    """
+    Parses a single large elu file with its nodes split over worker processes.\n
+    A first pass (fileprobe.probe_elu()) finds where every node starts by skipping over the tables, then runs of
+    adjacent nodes are decoded in parallel and merged back in file order.\n
+    @param file_path Path of the elu file\n
+    @param workers Number of worker processes. default=None, one per CPU. 1 parses in the calling process.\n
+    @return Returns the FEluParseResult, the same as parse_elu_file() would\n
+    """
+    probe = fileprobe.probe_elu(file_path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(probe.nodes))
+    if workers <= 1 or not probe.supported:
+        return parse_elu_file(file_path)
+
+    result = FEluParseResult(file_path)
+    result.signature, result.version = probe.signature, probe.version
+    result.material_num, result.mesh_num = probe.material_num, probe.mesh_num
+    # A few chunks per worker, so that one heavy run of nodes does not leave the other workers idle
+    chunks = _split_node_offsets(probe, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_elu_nodes, file_path, probe.version, chunk) for chunk in chunks]
+        for future in futures:
+            result.nodes.extend(future.result())
+    return result
+
+
+def parse_ani_file(file_path: str) -> FAniParseResult:
+    result = FAniParseResult(file_path)
+    ani_mesh = FAniMesh(file_path)
+    ani_mesh.load_and_parse_ani_file()
+    header = ani_mesh._ani_header
+    result.signature, result.version = header.signature, header.version
+    result.max_frame, result.model_num = header.max_frame, header.model_num
+    result.ani_type = getattr(header.ani_type, 'value', header.ani_type)
+    for ani_node in ani_mesh._ani_mesh_nodes:
+        result.nodes.append({
+            'Name': ani_node.Name,
+            'ParentName': ani_node.ParentName,
+            'LocalMatrix': _flatten_matrix(ani_node.LocalMatrix),
+            'BaseTranslation': _vector_values(ani_node.BaseTranslation, 3),
+            'BaseRotation': _vector_values(ani_node.BaseRotation, 4),
+            'BaseScale': _vector_values(ani_node.BaseScale, 3),
+            **{name: _key_track_array(getattr(ani_node, name)) for name in ANI_NODE_TRACKS},
+            'VertexFrame': numpy.array(ani_node.VertexFrame, dtype=numpy.uint32),
+            'VertexTable': numpy.array(ani_node.VertexTable, dtype=numpy.float32),
+            'BoundingBox': _bounding_box_values(ani_node.BoundingBox),
+        })
+    return result
+
+
+def parse_file(file_path: str):
+    """
+    Parses a single .elu or .ani file. Runs inside the worker processes of parse_many().\n
+    Errors do not propagate, they are stored in the error attribute of the result.\n
+    @return Returns a FEluParseResult or FAniParseResult\n
+    """
+    is_elu_file = commonfunctions.get_file_extension(file_path) == '.elu'
+    try:
+        return parse_elu_file(file_path) if is_elu_file else parse_ani_file(file_path)
+    except Exception as err:
+        result = FEluParseResult(file_path) if is_elu_file else FAniParseResult(file_path)
+        result.error = "{0}: {1}".format(type(err).__name__, err)
+        return result
+
+
+def parse_many(file_paths, workers: int = None, chunk_size: int = None) -> list:
+    """
+    Parses .elu and .ani files in parallel worker processes\n
+    @param file_paths Paths of the files to parse\n
+    @param workers Number of worker processes. default=None, one per CPU. 1 parses in the calling process.\n
+    @param chunk_size Number of files sent to a worker at once. default=None, picked from the number of files.\n
+    @return Returns a list of FEluParseResult/FAniParseResult, in the order of file_paths\n
+    """
+    file_paths = list(file_paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(file_paths)))
+    if workers == 1:
+        return [parse_file(file_path) for file_path in file_paths]
+
+    if chunk_size is None:
+        chunk_size = max(1, len(file_paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_file, file_paths, chunksize=chunk_size))
@@ -8,10 +8,137 @@ Contains functions to read binary data from elu/ani files
 """
 
 import datetime
+import mmap
 import struct
+import sys
+import numpy
+
+from functools import lru_cache
+
+
+class NegativeSizeError(struct.error):
+    """
+    Raised for tables whose count is negative. A struct.error, so that readers handle it along with short reads, but
+    it means a corrupt count rather than a truncated file.
+    """
+
+
+class FBinaryCursor:
+    """
+    Read cursor over the whole content of an elu/ani file.\n
+    The file is read into memory once (or memory mapped) and every read after that is a
+    struct.unpack_from on the shared buffer, instead of a file_stream.read() syscall per value.\n
+    Implements the read/seek/tell/close subset of a binary file stream, so it can be passed to
+    every loader in place of the raw file stream.\n
+    """
+
+    def __init__(self, buffer, offset: int = 0) -> None:
+        self._buffer = buffer
+        self._offset: int = offset
+        self._mmap = buffer if isinstance(buffer, mmap.mmap) else None
+
+    @classmethod
+    def from_file(cls, file_path: str, use_mmap: bool = False):
+        """
+        Creates a cursor over the content of file at file_path\n
+        @param file_path Path of the elu/ani file\n
+        @param use_mmap Memory map the file instead of reading it into memory. Empty files are always read.\n
+        @return Returns the cursor, positioned at the start of the file\n
+        """
+        with open(file_path, 'rb') as file_stream:
+            if use_mmap and file_stream.seek(0, 2) > 0:
+                return cls(mmap.mmap(file_stream.fileno(), 0, access=mmap.ACCESS_READ))
+            file_stream.seek(0)
+            return cls(file_stream.read())
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._offset
+        elif whence == 2:
+            offset += len(self._buffer)
+        self._offset = offset
+        return self._offset
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._offset
+        if size is None or size < 0:
+            end = len(self._buffer)
+        else:
+            end = min(start + size, len(self._buffer))
+        self._offset = max(end, start)
+        return bytes(self._buffer[start:end])
+
+    def unpack(self, fmt_struct: struct.Struct) -> tuple:
+        """
+        Unpacks fmt_struct at the current offset and advances the cursor past it\n
+        @param fmt_struct Precompiled struct, see get_struct()\n
+        @return Returns the unpacked tuple\n
+        """
+        # If the buffer is too short, struct.error is raised just like struct.unpack on a short read
+        data = fmt_struct.unpack_from(self._buffer, self._offset)
+        self._offset += fmt_struct.size
+        return data
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Arrays returned by read_array() still view the map, it is released along with them
+                pass
+            self._mmap = None
+        self._buffer = b''
+        self._offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+@lru_cache(maxsize=None)
+def get_struct(endian: str, format_char: str, count: int) -> struct.Struct:
+    """
+    Returns a precompiled struct for count values of format_char, so that format strings\n
+    are built and parsed only once per (endian, format, count) combination\n
+    """
+    return struct.Struct(endian + str(count) + format_char)
+
+
+@lru_cache(maxsize=None)
+def get_format_struct(format_string: str) -> struct.Struct:
+    """
+    Returns a precompiled struct for a whole format string (e.g. '<Ii16fi'), see get_struct()\n
+    """
+    return struct.Struct(format_string)
+
+
+# Maximum number of distinct raw words kept by read_word()
+WORD_CACHE_MAX_SIZE = 8192
+
+# Raw word bytes (as stored in the file) -> decoded, interned word
+_word_cache: dict = {}
+
+
+def _unpack(file_stream, fmt_struct: struct.Struct) -> tuple:
+    if type(file_stream) is FBinaryCursor:
+        return file_stream.unpack(fmt_struct)
+    return fmt_struct.unpack(file_stream.read(fmt_struct.size))
+
 
 """
-Functions to read binary data directly by passing the filestream object
+Functions to read binary data directly by passing the filestream object (or a FBinaryCursor)
 """
 
 
@@ -31,7 +158,7 @@ def read_int(file_stream, num_of_ints, offset=None, endian='<'):
         pass
 
     # If an exception occurs while unpacking, it should be handled in upper level function
-    data = struct.unpack(endian + num_of_ints * 'i', file_stream.read(num_of_ints * 4))
+    data = _unpack(file_stream, get_struct(endian, 'i', num_of_ints))
     return data
 
 
@@ -51,7 +178,25 @@ def read_unsigned_int(file_stream, num_of_unsigned_ints, offset=None, endian='<'
         pass
 
     # If an exception occurs while unpacking, it should be handled in upper level function
-    data = struct.unpack(endian + num_of_unsigned_ints * 'I', file_stream.read(num_of_unsigned_ints * 4))
+    data = _unpack(file_stream, get_struct(endian, 'I', num_of_unsigned_ints))
+    return data
+
+
+def read_struct(file_stream, fmt_struct, offset=None):
+    """
+    Reads the values described by a precompiled struct from filestream and returns them in a tuple\n
+    @param file_stream Binary file stream to read values from.\n
+    @param fmt_struct Precompiled struct, see get_struct() and get_format_struct()\n
+    @param offset Cursor offset to read binary data in FileStream from. default=None.\n
+    @return Returns the tuple of values\n
+    """
+    if offset is not None:
+        file_stream.seek(offset)
+    else:
+        pass
+
+    # If an exception occurs while unpacking, it should be handled in upper level function
+    data = _unpack(file_stream, fmt_struct)
     return data
 
 
@@ -61,6 +206,8 @@ def read_word(file_stream, offset=None, endian='<'):
     first 4 bytes in FileStream represent an integer.\n
     This integer is used to determine the size of string to be read.\n
     Assumes characters to be ascii\n
+    The string is read in a single read, NUL characters are stripped and the decoded\n
+    word is interned and cached, since node and bone names repeat across files.\n
 
     @param file_stream Binary file stream to read word from.\n
     @param offset Cursor offset to read binary data in FileStream from. default=None.\n
@@ -73,13 +220,19 @@ def read_word(file_stream, offset=None, endian='<'):
         pass
 
     string_size = read_int(file_stream, 1, offset, endian)[0]
-    word = ''
-    for i in range(string_size):
-        # If an exception occurs while unpacking, it should be handled in upper level function
-        # Character read will be b''
-        character = struct.unpack('c', file_stream.read(1))[0]
-        if ord(character) != 0:
-            word += character.decode('ascii')
+    if string_size <= 0:
+        return ''
+
+    raw_word = file_stream.read(string_size)
+    # If an exception occurs while unpacking, it should be handled in upper level function
+    if len(raw_word) != string_size:
+        raise struct.error("unpack requires a buffer of {0} bytes".format(string_size))
+
+    word = _word_cache.get(raw_word)
+    if word is None:
+        word = sys.intern(raw_word.replace(b'\x00', b'').decode('ascii'))
+        if len(_word_cache) < WORD_CACHE_MAX_SIZE:
+            _word_cache[raw_word] = word
     return word
 
 
@@ -99,7 +252,7 @@ def read_short(file_stream, num_of_shorts, offset=None, endian='<'):
         pass
 
     # If an exception occurs while unpacking, it should be handled in upper level function
-    data = struct.unpack(endian + num_of_shorts * 'h', file_stream.read(num_of_shorts * 2))
+    data = _unpack(file_stream, get_struct(endian, 'h', num_of_shorts))
     return data
     
 
@@ -119,7 +272,7 @@ def read_unsigned_short(file_stream, num_of_unsigned_shorts, offset=None, endian
         pass
 
     # If an exception occurs while unpacking, it should be handled in upper level function
-    data = struct.unpack(endian + num_of_unsigned_shorts * 'H', file_stream.read(num_of_unsigned_shorts * 2))
+    data = _unpack(file_stream, get_struct(endian, 'H', num_of_unsigned_shorts))
     return data
 
 
@@ -139,5 +292,162 @@ def read_float(file_stream, num_of_floats, offset=None, endian='<'):
         pass
 
     # If an exception occurs while unpacking, it should be handled in upper level function
-    data = struct.unpack(endian + num_of_floats * 'f', file_stream.read(num_of_floats * 4))
+    data = _unpack(file_stream, get_struct(endian, 'f', num_of_floats))
+    return data
+
+
+def skip_bytes(file_stream, num_of_bytes):
+    """
+    Moves the cursor of filestream num_of_bytes forward without reading them\n
+    @param file_stream Binary file stream (or FBinaryCursor) to move the cursor of.\n
+    @param num_of_bytes Number of bytes to skip\n
+    @return Returns the new cursor offset\n
+    """
+    # Raise the same error type as the read functions, so that a corrupt count is caught while skipping too
+    if num_of_bytes < 0:
+        raise NegativeSizeError("negative table size: {0}".format(num_of_bytes))
+    if type(file_stream) is FBinaryCursor and file_stream.tell() + num_of_bytes > len(file_stream):
+        raise struct.error("unpack requires a buffer of {0} bytes".format(num_of_bytes))
+    return file_stream.seek(num_of_bytes, 1)
+
+
+"""
+Functions to read whole tables of fixed-size records as numpy arrays
+"""
+
+
+@lru_cache(maxsize=None)
+def get_dtype(endian: str, type_code: str) -> numpy.dtype:
+    return numpy.dtype(endian + type_code)
+
+
+def read_array(file_stream, dtype, count, components=1, offset=None):
+    """
+    Reads count records of components values of dtype from filestream as a numpy array\n
+    If file_stream is a FBinaryCursor, the returned array is a read-only view over the cursor's
+    buffer (no copy is made). Otherwise the data is read in a single file_stream.read() call.\n
+    @param file_stream Binary file stream (or FBinaryCursor) to read the table from.\n
+    @param dtype numpy dtype of a single value. Can be a structured dtype describing a whole record.\n
+    @param count Number of records to read\n
+    @param components Number of values per record. default=1.\n
+    @param offset Cursor offset to read binary data in FileStream from. default=None.\n
+    @return Returns an array of shape (count,) if components is 1, else (count, components)\n
+    """
+    if offset is not None:
+        file_stream.seek(offset)
+    else:
+        pass
+
+    dtype = numpy.dtype(dtype)
+    num_of_values = count * components
+    num_of_bytes = num_of_values * dtype.itemsize
+    if num_of_values < 0:
+        raise NegativeSizeError("negative table size: {0}".format(count))
+
+    if type(file_stream) is FBinaryCursor:
+        start = file_stream.tell()
+        buffer = file_stream.buffer
+        available = len(buffer) - start
+    else:
+        start = 0
+        buffer = file_stream.read(num_of_bytes)
+        available = len(buffer)
+
+    # Raise the same error type as the scalar read functions, so upper level functions handle both alike
+    if available < num_of_bytes:
+        raise struct.error("unpack requires a buffer of {0} bytes".format(num_of_bytes))
+
+    if num_of_values == 0:
+        data = numpy.empty(0, dtype=dtype)
+    else:
+        data = numpy.frombuffer(buffer, dtype=dtype, count=num_of_values, offset=start)
+
+    if type(file_stream) is FBinaryCursor:
+        file_stream.seek(start + num_of_bytes)
+
+    if components != 1:
+        data = data.reshape(count, components)
     return data
+
+
+def read_int_array(file_stream, count, components=1, offset=None, endian='<'):
+    """
+    Reads a table of int32 values, see read_array()\n
+    """
+    return read_array(file_stream, get_dtype(endian, 'i4'), count, components, offset)
+
+
+def read_unsigned_int_array(file_stream, count, components=1, offset=None, endian='<'):
+    """
+    Reads a table of uint32 values, see read_array()\n
+    """
+    return read_array(file_stream, get_dtype(endian, 'u4'), count, components, offset)
+
+
+def read_short_array(file_stream, count, components=1, offset=None, endian='<'):
+    """
+    Reads a table of int16 values, see read_array()\n
+    """
+    return read_array(file_stream, get_dtype(endian, 'i2'), count, components, offset)
+
+
+def read_unsigned_short_array(file_stream, count, components=1, offset=None, endian='<'):
+    """
+    Reads a table of uint16 values, see read_array()\n
+    """
+    return read_array(file_stream, get_dtype(endian, 'u2'), count, components, offset)
+
+
+def read_float_array(file_stream, count, components=1, offset=None, endian='<'):
+    """
+    Reads a table of float32 values, see read_array()\n
+    """
+    return read_array(file_stream, get_dtype(endian, 'f4'), count, components, offset)
+
+
+def read_struct_array(file_stream, record_dtype, count, offset=None):
+    """
+    Reads a table of count records described by the structured record_dtype, see read_array()\n
+    record_dtype must spell out byte order and must not contain padding that is not present in the file.\n
+    """
+    return read_array(file_stream, record_dtype, count, 1, offset)
+
+
+def scan_counted_records(file_stream, num_of_groups, record_size, offset=None, endian='<'):
+    """
+    Walks a table of num_of_groups variable-length groups, each stored as an int count followed by\n
+    count records of record_size bytes, without decoding the records.\n
+    The cursor is left right after the table.\n
+    @param file_stream Binary file stream (or FBinaryCursor) to walk.\n
+    @param num_of_groups Number of groups in the table\n
+    @param record_size Size of a single record in bytes\n
+    @param offset Cursor offset to read binary data in FileStream from. default=None.\n
+    @param endian little or big endian method to use for struct unpacking\n
+    @return Returns an int64 array with the count of every group\n
+    """
+    if offset is not None:
+        file_stream.seek(offset)
+    else:
+        pass
+
+    counts = [0] * num_of_groups
+    count_struct = get_struct(endian, 'i', 1)
+    if type(file_stream) is FBinaryCursor:
+        unpack_count = count_struct.unpack_from
+        buffer = file_stream.buffer
+        position = file_stream.tell()
+        for i in range(num_of_groups):
+            # If an exception occurs while unpacking, it should be handled in upper level function
+            count = unpack_count(buffer, position)[0]
+            counts[i] = count
+            position += 4 + count * record_size
+        if position > len(buffer):
+            raise struct.error("unpack requires a buffer of {0} bytes".format(position - file_stream.tell()))
+        file_stream.seek(position)
+    else:
+        for i in range(num_of_groups):
+            count = _unpack(file_stream, count_struct)[0]
+            counts[i] = count
+            file_stream.seek(count * record_size, 1)
+
+    return numpy.array(counts, dtype=numpy.int64)
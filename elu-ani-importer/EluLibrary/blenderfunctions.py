@@ -18,9 +18,15 @@ except ImportError:
 import os
 import shutil
 import datatypes
+import fileprobe
+import errorhandling
 import globalvars
 from elumesh import FEluMesh
-from animesh import FAniMesh
+from animesh import FAniMeshCache
+
+
+# Parsed animations shared by all models of an export run
+AniMeshCache = FAniMeshCache()
 
 
 def reset_blender():
@@ -170,17 +176,11 @@ def draw_elu_mesh(elu_mesh_obj, blender_materials):
         out_collection.objects.link(mesh_obj)
         # scene.objects.link(mesh_obj)
 
-        faces = []
-        for Polygon in EluNode.PolygonTable:
-            face = []
-            for FaceSubData in Polygon.FaceSubDatas:
-                face.append(FaceSubData.p)
-            faces.append(face)
+        polygon_offsets = EluNode.PolygonOffsets.tolist()
+        corner_points = EluNode.PolygonCorners['p'].tolist()
+        faces = [corner_points[polygon_offsets[i]:polygon_offsets[i + 1]] for i in range(len(polygon_offsets) - 1)]
 
-        points = []
-        for NodePoint in EluNode.PointsTable:
-            point = NodePoint.get_vec_data_as_tuple()
-            points.append(Vector(point))
+        points = EluNode.Points.tolist()
 
         bpy.context.view_layer.update()
         bpy.context.view_layer.objects.active = mesh_obj
@@ -198,18 +198,19 @@ def draw_elu_mesh(elu_mesh_obj, blender_materials):
             vertex_groups[bone_name] = []
 
         # Add bone weight info
-        for PhysiqueInfo in EluNode.PhysiqueTable:
-            for PhysiqueSubData in PhysiqueInfo.PhysiqueSubDatas:
-                bone_id = PhysiqueSubData.cid
+        physique_bone_ids = EluNode.PhysiqueData['cid'].tolist()
+        physique_weights = EluNode.PhysiqueData['weight'].tolist()
+        for vertex_index, physique_size in enumerate(EluNode.PhysiqueSizes.tolist()):
+            for influence_index in range(physique_size):
+                bone_id = physique_bone_ids[vertex_index][influence_index]
                 bone_name = elu_mesh_obj.EluMeshNodes[EluNode.BoneTableIndices[bone_id]].NodeName
                 if bone_name in vertex_groups:
-                    vertex_index = EluNode.PhysiqueTable.index(PhysiqueInfo)
-                    vertex_groups[bone_name].append((vertex_index, PhysiqueSubData.weight))
+                    vertex_groups[bone_name].append((vertex_index, physique_weights[vertex_index][influence_index]))
 
         # If there is no bone weight info, all vertexes are weighted on current bone equally
         if len(EluNode.BoneTableIndices) == 0:
             vertex_groups[EluNode.NodeName] = []
-            for vertex_index in range(len(EluNode.PointsTable)):
+            for vertex_index in range(len(EluNode.Points)):
                 vertex_groups[EluNode.NodeName].append((vertex_index, 1))
 
         for name, vertex_weight_info in vertex_groups.items():
@@ -226,7 +227,7 @@ def draw_elu_mesh(elu_mesh_obj, blender_materials):
         UV Map the mesh
         """
         # mesh_has_extra_uv = False
-        # if len(EluNode.TexCoordExtraTable) > 0:
+        # if len(EluNode.TexCoordsExtra) > 0:
         #     mesh_has_extra_uv = True
 
         # Not going to include extra uv layer right now.
@@ -244,8 +245,8 @@ def draw_elu_mesh(elu_mesh_obj, blender_materials):
         bpy.context.view_layer.update()
         mesh_obj.select_set(True)
 
-        # Add uv map if and only if TextCoordTable contains any UVs
-        if len(EluNode.TexCoordTable) > 0:
+        # Add uv map if and only if TexCoords contains any UVs
+        if len(EluNode.TexCoords) > 0:
             if bpy.ops.object.mode_set.poll():
                 bpy.ops.object.mode_set(mode="EDIT")
             else:
@@ -255,41 +256,43 @@ def draw_elu_mesh(elu_mesh_obj, blender_materials):
             uv_layer = bm.loops.layers.uv.verify()
             if mesh_has_extra_uv:
                 uv_layer_extra = bm.loops.layers.uv.verify()
+                corner_extra_uvs = EluNode.PolygonCorners['uv2'].tolist()
+            polygon_material_ids = EluNode.PolygonMaterialIDs.tolist()
+            corner_uvs = EluNode.PolygonCorners['uv'].tolist()
             # bm.faces.layers.tex.verify()
             # @todo for the line above?
 
             face_index = 0
             for face in bm.faces:
                 face.smooth = 1
-                if EluNode.PolygonTable[face_index].MaterialID < 0:
+                material_id = polygon_material_ids[face_index]
+                if material_id < 0:
                     pass
-                elif EluNode.PolygonTable[face_index].MaterialID >= len(blender_materials):
+                elif material_id >= len(blender_materials):
                     pass
                 else:
-                    face.material_index = EluNode.PolygonTable[face_index].MaterialID
+                    face.material_index = material_id
 
-                corner_index = 0
+                corner_index = polygon_offsets[face_index]
                 for loop in face.loops:
                     loop_uv = loop[uv_layer]
                     if mesh_has_extra_uv:
                         loop_uv_extra = loop[uv_layer_extra]
 
-                    polygon = EluNode.PolygonTable[face_index]
-                    face_sub_data = polygon.FaceSubDatas[corner_index]
-                    uv_index = face_sub_data.uv
+                    uv_index = corner_uvs[corner_index]
                     try:
-                        elu_uv = EluNode.TexCoordTable[uv_index].get_vec_data_as_tuple()
+                        elu_uv = EluNode.TexCoords[uv_index].tolist()
                     except IndexError:
                         print(
-                            "Length of TexCoordTable : {0}, uv_index: {1}".format(len(EluNode.TexCoordTable), uv_index))
+                            "Length of TexCoords : {0}, uv_index: {1}".format(len(EluNode.TexCoords), uv_index))
                         print("Elu Version: {0}".format(elu_mesh_obj.EluHeader.version))
                         raise AssertionError
                     blender_uv = [elu_uv[0], 1 - elu_uv[1]]
                     loop_uv.uv = blender_uv
 
                     if mesh_has_extra_uv:
-                        uv_extra_index = face_sub_data.uv2
-                        elu_uv_extra = EluNode.TexCoordExtraTable[uv_extra_index].get_vec_data_as_tuple()
+                        uv_extra_index = corner_extra_uvs[corner_index]
+                        elu_uv_extra = EluNode.TexCoordsExtra[uv_extra_index].tolist()
                         blender_uv_extra = [elu_uv_extra[0], 1 - elu_uv_extra[1]]
                         loop_uv_extra.uv = blender_uv_extra
                     corner_index += 1
@@ -308,8 +311,18 @@ def load_and_export_animations(elu_mesh_obj, animations, raider_file_obj):
             armature_object = obj
 
     for animation in animations:
-        ani_mesh_obj = FAniMesh(animation)
-        ani_mesh_obj.load_and_parse_ani_file()
+        try:
+            # Vertex animations are not supported, check the header before parsing the whole file
+            if not fileprobe.is_bone_ani_file(animation):
+                print("Skipping non bone animation:", animation)
+                continue
+
+            # Shared with other models, the nodes must not be modified
+            ani_mesh_obj = AniMeshCache.get(animation)
+        except errorhandling.ParseError as err:
+            # Over the memory budget or malformed, the other animations of the model are still exported
+            print("Skipping:", err)
+            continue
 
         if ani_mesh_obj._ani_header.ani_type == datatypes.EAnimationType.RAniType_Bone:
             scene = bpy.context.scene
@@ -421,15 +434,10 @@ def load_and_export_animations(elu_mesh_obj, animations, raider_file_obj):
                                               frame=frame,
                                               group=AniNode.Name)
 
-                for i in range(AniNode.PositionKeyTrack.Count):
-                    try:
-                        frame = AniNode.PositionKeyTrack.Data[i].Frame / 160
-                    except IndexError:
-                        print("index: ", i, ", length of positionkeytrack", len(AniNode.PositionKeyTrack.Data),
-                              ", count: ", AniNode.PositionKeyTrack.Count)
-                        raise Exception
-                    elu_position = AniNode.PositionKeyTrack.Data[i].Vector
-                    position_vector = Vector(elu_position.get_vec_data_as_tuple())
+                position_keys = AniNode.PositionKeyTrack.get_keys()
+                for frame, elu_position in zip((position_keys['frame'] / 160).tolist(),
+                                               position_keys['value'].tolist()):
+                    position_vector = Vector(elu_position)
                     if pose_bone.parent:
                         result = pose_bone.parent.matrix @ position_vector
                         armature_matrix_inverse = armature_object.matrix_world.inverted()
@@ -464,10 +472,10 @@ def load_and_export_animations(elu_mesh_obj, animations, raider_file_obj):
                                               frame=frame,
                                               group=AniNode.Name)
 
-                for i in range(AniNode.RotationKeyTrack.Count):
-                    frame = AniNode.RotationKeyTrack.Data[i].Frame / 160
-                    elu_quat = AniNode.RotationKeyTrack.Data[i].Quat
-                    rot_quat = Quaternion((elu_quat.W, elu_quat.X, elu_quat.Y, elu_quat.Z))
+                rotation_keys = AniNode.RotationKeyTrack.get_keys()
+                for frame, (x, y, z, w) in zip((rotation_keys['frame'] / 160).tolist(),
+                                               rotation_keys['value'].tolist()):
+                    rot_quat = Quaternion((w, x, y, z))
                     if pose_bone.parent:
                         result_quat = pose_bone.parent.matrix.to_quaternion() @ rot_quat
                         pbone_quat_inverted = pose_bone.matrix.to_quaternion().inverted()
@@ -489,41 +497,26 @@ def load_and_export_animations(elu_mesh_obj, animations, raider_file_obj):
                                               frame=frame,
                                               group=AniNode.Name)
 
-                for i in range(AniNode.ScaleKeyTrack.Count):
-                    frame = AniNode.ScaleKeyTrack.Data[i].Frame / 160
-                    elu_scale = AniNode.ScaleKeyTrack.Data[i].Vector
-
-                    scale_vector = Vector(elu_scale.get_vec_data_as_tuple())
+                scale_keys = AniNode.ScaleKeyTrack.get_keys()
+                for frame, elu_scale in zip((scale_keys['frame'] / 160).tolist(), scale_keys['value'].tolist()):
+                    scale_vector = Vector(elu_scale)
                     pose_bone.scale = scale_vector
                     pose_bone.keyframe_insert(data_path="scale",
                                               frame=frame,
                                               group=AniNode.Name)
 
                 # Begin visibility keyframes fix
-                source_frames = []
-                source_viskeys = []
-                for i in range(AniNode.VisKeyTrack.Count):
-                    frame = AniNode.VisKeyTrack.Data[i].Frame / 160
-                    vis_key = AniNode.VisKeyTrack.Data[i].Vis
-                    source_frames.append(frame)
-                    source_viskeys.append(vis_key)
+                vis_keys = AniNode.VisKeyTrack.get_keys()
+                source_frames = (vis_keys['frame'] / 160).tolist()
+                source_viskeys = vis_keys['value'].tolist()
 
                 final_frames, final_viskeys = generate_viskeys(source_frames, source_viskeys)
 
-                # Reset AniNode viskey data
-                AniNode.VisKeyTrack.Count = len(final_frames)
-                AniNode.VisKeyTrack.Data = []
-                for i in range(len(final_frames)):
-                    VisKey = datatypes.FVisKey()
-                    VisKey.Frame = final_frames[i]
-                    VisKey.Vis = final_viskeys[i]
-                    AniNode.VisKeyTrack.Data.append(VisKey)
-
                 # End visibility keyframes fix
 
-                for i in range(AniNode.VisKeyTrack.Count):
-                    frame = AniNode.VisKeyTrack.Data[i].Frame
-                    vis_key = AniNode.VisKeyTrack.Data[i].Vis
+                for i in range(len(final_frames)):
+                    frame = final_frames[i]
+                    vis_key = final_viskeys[i]
 
                     SET_VISKEY = False
                     if 0 <= int(frame) <= ani_mesh_obj._ani_header.max_frame:
@@ -551,7 +544,7 @@ def load_and_export_animations(elu_mesh_obj, animations, raider_file_obj):
                                     SET_VISKEY = True
                         else:
                             current_frame = int(frame)
-                            previous_frame = int(AniNode.VisKeyTrack.Data[i - 1].Frame / 160)
+                            previous_frame = int(final_frames[i - 1] / 160)
                             # previous_frame = current_frame - 1
 
                             if current_frame == previous_frame:
@@ -7,7 +7,9 @@ This module contains common data types for use in elu-ani-importer
 import enum
 import globalvars
 import struct
+import numpy
 
+from functools import lru_cache
 from typing import TypeVar
 
 FVector4Type = TypeVar("FVector4Type", bound="FVector4")
@@ -15,6 +17,9 @@ FVector4Type = TypeVar("FVector4Type", bound="FVector4")
 
 class FMatrix:
 
+    __slots__ = ('_00', '_01', '_02', '_03', '_10', '_11', '_12', '_13',
+                 '_20', '_21', '_22', '_23', '_30', '_31', '_32', '_33')
+
     def __init__(self, float_tuple: tuple) -> None:
         self._00: float = float_tuple[0]
         self._01: float = float_tuple[1]
@@ -42,6 +47,8 @@ class FMatrix:
 
 class FVector:
 
+    __slots__ = ('X', 'Y', 'Z')
+
     def __init__(self, float_tuple: tuple[float, ...]) -> None:
         self.X: float = float_tuple[0]
         self.Y: float = float_tuple[1]
@@ -53,6 +60,8 @@ class FVector:
 
 class FVector4:
 
+    __slots__ = ('X', 'Y', 'Z', 'W')
+
     def __init__(self, float_tuple: tuple[float, ...]) -> None:
         self.X: float = float_tuple[0]
         self.Y: float = float_tuple[1]
@@ -64,8 +73,50 @@ class FVector4:
         return FVector4((vec3.X, vec3.Y, vec3.Z, 1))
 
 
+class FVectorTableView:
+    """
+    Read-only sequence view of a (N, 3) or (N, 4) float array as FVector/FVector4 objects.
+    Kept so that code written against the old lists of FVector keeps working, objects are
+    only created for the rows that are actually accessed.
+    """
+
+    def __init__(self, array: numpy.ndarray) -> None:
+        self._array = array
+
+    def _make_vector(self, row: list):
+        if len(row) == 4:
+            return FVector4(row)
+        return FVector(row)
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._make_vector(row) for row in self._array[index].tolist()]
+        return self._make_vector(self._array[index].tolist())
+
+    def __iter__(self):
+        for row in self._array.tolist():
+            yield self._make_vector(row)
+
+
+def make_vector_array(vectors, components: int = 3) -> numpy.ndarray:
+    """
+    Converts a vector table (array, FVectorTableView or a list of FVector/FVector4) to a (N, components) float32 array
+    """
+    if isinstance(vectors, numpy.ndarray):
+        return vectors.astype(numpy.float32, copy=False).reshape(-1, components)
+    if isinstance(vectors, FVectorTableView):
+        return vectors._array
+    rows = [(v.X, v.Y, v.Z, v.W) if components == 4 else (v.X, v.Y, v.Z) for v in vectors]
+    return numpy.array(rows, dtype=numpy.float32).reshape(-1, components)
+
+
 class FQuaternion:
 
+    __slots__ = ('X', 'Y', 'Z', 'W')
+
     def __init__(self, float_tuple: tuple[float, ...]) -> None:
         self.X: float = float_tuple[0]
         self.Y: float = float_tuple[1]
@@ -74,18 +125,82 @@ class FQuaternion:
 
 
 class FBoundingBox:
+    """
+    Axis aligned bounding box. vmin and vmax are None while the box is empty.
+    """
 
-    def __init__(self):
-        self.vmin = None
-        self.vmax = None
+    __slots__ = ('vmin', 'vmax')
+
+    def __init__(self, vmin: FVector = None, vmax: FVector = None):
+        self.vmin = vmin
+        self.vmax = vmax
 
-    def add(self, point):
-        # @todo
-        pass
+    @classmethod
+    def from_points(cls, points) -> 'FBoundingBox':
+        """
+        Bounds of a (N, 3) point array, computed with a single min/max over the whole table
+        """
+        bounding_box = cls()
+        bounding_box.add_points(points)
+        return bounding_box
+
+    def is_empty(self) -> bool:
+        return self.vmin is None or self.vmax is None
+
+    def add(self, point) -> None:
+        """
+        Grows the box to contain a single FVector. Use add_points() for tables.
+        """
+        self.add_points(numpy.array([(point.X, point.Y, point.Z)], dtype=numpy.float32))
+
+    def add_points(self, points) -> None:
+        points = numpy.asarray(points).reshape(-1, 3)
+        if len(points) == 0:
+            return
+        vmin = points.min(axis=0).tolist()
+        vmax = points.max(axis=0).tolist()
+        if not self.is_empty():
+            vmin = [min(a, b) for a, b in zip(vmin, self.vmin.get_vec_data_as_tuple())]
+            vmax = [max(a, b) for a, b in zip(vmax, self.vmax.get_vec_data_as_tuple())]
+        self.vmin = FVector(vmin)
+        self.vmax = FVector(vmax)
+
+    def merge(self, other: 'FBoundingBox') -> None:
+        """
+        Grows the box to contain other
+        """
+        if not other.is_empty():
+            self.add_points([other.vmin.get_vec_data_as_tuple(), other.vmax.get_vec_data_as_tuple()])
+
+    def get_center(self) -> tuple[float, ...]:
+        return tuple((a + b) / 2 for a, b in zip(self.vmin.get_vec_data_as_tuple(), self.vmax.get_vec_data_as_tuple()))
+
+    def get_size(self) -> tuple[float, ...]:
+        return tuple(b - a for a, b in zip(self.vmin.get_vec_data_as_tuple(), self.vmax.get_vec_data_as_tuple()))
+
+    def intersects(self, other: 'FBoundingBox') -> bool:
+        if self.is_empty() or other.is_empty():
+            return False
+        return all(a_min <= b_max and b_min <= a_max for a_min, a_max, b_min, b_max in
+                   zip(self.vmin.get_vec_data_as_tuple(), self.vmax.get_vec_data_as_tuple(),
+                       other.vmin.get_vec_data_as_tuple(), other.vmax.get_vec_data_as_tuple()))
+
+    def matches(self, other: 'FBoundingBox', tolerance: float = 1e-3) -> bool:
+        """
+        True if both boxes have the same corners, within tolerance scaled by the size of the box
+        """
+        if self.is_empty() or other.is_empty():
+            return self.is_empty() and other.is_empty()
+        corners = numpy.array([self.vmin.get_vec_data_as_tuple(), self.vmax.get_vec_data_as_tuple()])
+        other_corners = numpy.array([other.vmin.get_vec_data_as_tuple(), other.vmax.get_vec_data_as_tuple()])
+        scale = max(1.0, float(numpy.abs(corners).max()))
+        return bool(numpy.all(numpy.abs(corners - other_corners) <= tolerance * scale))
 
 
 class FFaceSubData:
 
+    __slots__ = ('p', 'uv', 'uv2', 'n', 'n_tan', 'n_bin')
+
     def __init__(self) -> None:
         self.p: int = 0
         self.uv: int = 0
@@ -97,6 +212,8 @@ class FFaceSubData:
 
 class FVertexIndex:
 
+    __slots__ = ('p', 'n', 'uv', 'uv2', 'n_tan', 'n_bin')
+
     def __init__(self) -> None:
         self.p: int = 0
         self.n: int = 0
@@ -106,8 +223,18 @@ class FVertexIndex:
         self.n_bin: int = 0
 
 
+# Vertex index record as stored in elu files before version 15 (5 unsigned shorts, no uv2)
+VERTEX_INDEX_DTYPE_V12 = numpy.dtype([('p', '<u2'), ('n', '<u2'), ('uv', '<u2'), ('n_tan', '<u2'), ('n_bin', '<u2')])
+
+# Vertex index record as stored in elu files from version 15 onwards (6 unsigned shorts)
+VERTEX_INDEX_DTYPE = numpy.dtype([('p', '<u2'), ('n', '<u2'), ('uv', '<u2'), ('uv2', '<u2'), ('n_tan', '<u2'),
+                                  ('n_bin', '<u2')])
+
+
 class FVertexIndexV12:
 
+    __slots__ = ('p', 'n', 'uv', 'n_tan', 'n_bin')
+
     def __init__(self):
         self.p: int = 0
         self.n: int = 0
@@ -118,14 +245,85 @@ class FVertexIndexV12:
 
 class FMeshPolygonData:
 
+    __slots__ = ('Vertices', 'MaterialID', 'FaceSubDatas')
+
     def __init__(self):
         self.Vertices: int = 0
         self.MaterialID: int = 0
         self.FaceSubDatas: list[FFaceSubData] = []
 
 
+# Face corner record as stored in elu files before version 15 (5 unsigned shorts, no uv2)
+FACE_SUB_DATA_DTYPE_V12 = numpy.dtype([('p', '<u2'), ('uv', '<u2'), ('n', '<u2'), ('n_tan', '<u2'), ('n_bin', '<u2')])
+
+# Face corner record as stored in elu files from version 15 onwards (6 unsigned shorts)
+FACE_SUB_DATA_DTYPE = numpy.dtype([('p', '<u2'), ('uv', '<u2'), ('uv2', '<u2'), ('n', '<u2'), ('n_tan', '<u2'),
+                                   ('n_bin', '<u2')])
+
+
+class FPolygonTableView:
+    """
+    Read-only sequence view of the CSR polygon table of an elu node as FMeshPolygonData objects.
+    Kept so that code written against the old list of FMeshPolygonData keeps working.
+    """
+
+    def __init__(self, offsets: numpy.ndarray, corners: numpy.ndarray, material_ids: numpy.ndarray) -> None:
+        self._offsets = offsets
+        self._corners = corners
+        self._material_ids = material_ids
+
+    def _make_polygon(self, index: int) -> FMeshPolygonData:
+        polygon = FMeshPolygonData()
+        start = int(self._offsets[index])
+        end = int(self._offsets[index + 1])
+        polygon.Vertices = end - start
+        polygon.MaterialID = int(self._material_ids[index])
+        has_uv2 = 'uv2' in self._corners.dtype.names
+        for corner in self._corners[start:end].tolist():
+            face_sub_data = FFaceSubData()
+            if has_uv2:
+                face_sub_data.p, face_sub_data.uv, face_sub_data.uv2, face_sub_data.n, face_sub_data.n_tan, \
+                    face_sub_data.n_bin = corner
+            else:
+                face_sub_data.p, face_sub_data.uv, face_sub_data.n, face_sub_data.n_tan, face_sub_data.n_bin = corner
+                face_sub_data.uv2 = -1
+            polygon.FaceSubDatas.append(face_sub_data)
+        return polygon
+
+    def __len__(self) -> int:
+        return len(self._material_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._make_polygon(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("polygon index out of range")
+        return self._make_polygon(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._make_polygon(index)
+
+
+def make_polygon_arrays(polygons) -> tuple:
+    """
+    Converts a list of FMeshPolygonData to the CSR polygon arrays (offsets, corners, material ids)
+    """
+    degrees = [polygon.Vertices for polygon in polygons]
+    offsets = numpy.zeros(len(polygons) + 1, dtype=numpy.int32)
+    numpy.cumsum(degrees, out=offsets[1:])
+    corners = numpy.array([(s.p, s.uv, max(s.uv2, 0), s.n, s.n_tan, s.n_bin) for polygon in polygons
+                           for s in polygon.FaceSubDatas], dtype=FACE_SUB_DATA_DTYPE)
+    material_ids = numpy.array([polygon.MaterialID for polygon in polygons], dtype=numpy.int16)
+    return offsets, corners, material_ids
+
+
 class FPhysiqueSubData:
 
+    __slots__ = ('cid', 'pid', 'weight')
+
     def __init__(self):
         self.cid: int = 0
         self.pid: int = 0
@@ -134,13 +332,73 @@ class FPhysiqueSubData:
 
 class FPhysiqueInfo:
 
+    __slots__ = ('Num', 'PhysiqueSubDatas')
+
     def __init__(self):
         self.Num: int = 0
         self.PhysiqueSubDatas: list[FPhysiqueSubData] = []
 
 
+# Physique (skin weight) record as stored in elu files
+PHYSIQUE_SUB_DATA_DTYPE = numpy.dtype([('cid', '<u2'), ('pid', '<u2'), ('weight', '<f4')])
+
+
+class FPhysiqueTableView:
+    """
+    Read-only sequence view of the padded physique arrays of an elu node as FPhysiqueInfo objects.
+    Kept so that code written against the old list of FPhysiqueInfo keeps working.
+    """
+
+    def __init__(self, physique_data: numpy.ndarray, sizes: numpy.ndarray, nums: numpy.ndarray) -> None:
+        self._physique_data = physique_data
+        self._sizes = sizes
+        self._nums = nums
+
+    def _make_physique_info(self, index: int) -> FPhysiqueInfo:
+        physique_info = FPhysiqueInfo()
+        physique_info.Num = int(self._nums[index])
+        for cid, pid, weight in self._physique_data[index, :int(self._sizes[index])].tolist():
+            physique_sub_data = FPhysiqueSubData()
+            physique_sub_data.cid = cid
+            physique_sub_data.pid = pid
+            physique_sub_data.weight = weight
+            physique_info.PhysiqueSubDatas.append(physique_sub_data)
+        return physique_info
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._make_physique_info(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("physique index out of range")
+        return self._make_physique_info(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._make_physique_info(index)
+
+
+def make_physique_arrays(physique_infos) -> tuple:
+    """
+    Converts a list of FPhysiqueInfo to the padded physique arrays (data, sizes, nums)
+    """
+    sizes = numpy.array([len(info.PhysiqueSubDatas) for info in physique_infos], dtype=numpy.int32)
+    nums = numpy.array([info.Num for info in physique_infos], dtype=numpy.int32)
+    physique_data = numpy.zeros((len(sizes), int(sizes.max(initial=0))), dtype=PHYSIQUE_SUB_DATA_DTYPE)
+    for index, info in enumerate(physique_infos):
+        for column, sub_data in enumerate(info.PhysiqueSubDatas):
+            physique_data[index, column] = (sub_data.cid, sub_data.pid, sub_data.weight)
+    return physique_data, sizes, nums
+
+
 class FMtrlTableInfo:
 
+    __slots__ = ('MaterialID', 'Offset', 'Count', 'SubMaterialIDForDrawMasking')
+
     def __init__(self):
         self.MaterialID: int = 0
         self.Offset: int = 0
@@ -148,6 +406,54 @@ class FMtrlTableInfo:
         self.SubMaterialIDForDrawMasking: int = 0
 
 
+MTRL_TABLE_INFO_DTYPE = numpy.dtype([('MaterialID', '<i4'), ('Offset', '<u2'), ('Count', '<u2'),
+                                     ('SubMaterialIDForDrawMasking', '<i4')])
+
+
+class FRecordTableView:
+    """
+    Read-only sequence view of a structured record array as objects of record_class, with one attribute per field.
+    defaults gives the attribute values of fields that are missing from the array's dtype.
+    """
+
+    def __init__(self, records: numpy.ndarray, record_class, defaults: dict = None) -> None:
+        self._records = records
+        self._record_class = record_class
+        self._names = records.dtype.names
+        self._defaults = {name: value for name, value in (defaults or {}).items() if name not in self._names}
+
+    def _make_record(self, values: tuple):
+        record = self._record_class()
+        for name, value in zip(self._names, values):
+            setattr(record, name, value)
+        for name, value in self._defaults.items():
+            setattr(record, name, value)
+        return record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._make_record(values) for values in self._records[index].tolist()]
+        return self._make_record(self._records[index].item())
+
+    def __iter__(self):
+        for values in self._records.tolist():
+            yield self._make_record(values)
+
+
+def make_record_array(records, dtype: numpy.dtype) -> numpy.ndarray:
+    """
+    Converts a sequence of record objects (or a FRecordTableView) to a structured array of dtype
+    """
+    if isinstance(records, numpy.ndarray):
+        return records
+    if isinstance(records, FRecordTableView):
+        return records._records
+    return numpy.array([tuple(getattr(record, name) for name in dtype.names) for record in records], dtype=dtype)
+
+
 class RMeshAlign(enum.Enum):
     RMA_NONE = 0
     RMA_NORMAL = 1
@@ -179,61 +485,179 @@ class FEluNode:
         self.BlenderLocalMatrix = None
         self.BlenderGlobalMatrix = None
 
+        # Vertex tables are contiguous float32 arrays of shape (Count, 3), tangents are (Count, 4).
+        # The *Table properties below give the old FVector/FVector4 sequence access to them.
         self.PointsCount = 0
-        self.PointsTable = []
+        self.Points = numpy.empty((0, 3), dtype=numpy.float32)
 
         self.NormalsCount = 0
-        self.NormalsTable = []
+        self.Normals = numpy.empty((0, 3), dtype=numpy.float32)
 
         self.TangentTanCount = 0
-        self.TangentTanTable = []
+        self.TangentTans = numpy.empty((0, 4), dtype=numpy.float32)
 
         self.TangentBinCount = 0
-        self.TangentBinTable = []
+        self.TangentBins = numpy.empty((0, 3), dtype=numpy.float32)
 
         self.TexCoordCount = 0
-        self.TexCoordTable = []
+        self.TexCoords = numpy.empty((0, 3), dtype=numpy.float32)
 
         self.TexCoordExtraCount = 0
-        self.TexCoordExtraTable = []
+        self.TexCoordsExtra = numpy.empty((0, 3), dtype=numpy.float32)
 
+        # Polygon table in CSR form. Corners of polygon i are PolygonCorners[PolygonOffsets[i]:PolygonOffsets[i + 1]],
+        # PolygonCorners uses FACE_SUB_DATA_DTYPE_V12 or FACE_SUB_DATA_DTYPE depending on the elu version.
         self.FaceCount = 0
-        self.PolygonTable = []
+        self.PolygonOffsets = numpy.zeros(1, dtype=numpy.int32)
+        self.PolygonCorners = numpy.empty(0, dtype=FACE_SUB_DATA_DTYPE)
+        self.PolygonMaterialIDs = numpy.empty(0, dtype=numpy.int16)
 
         self.TotalDegrees = 0
         self.TotalTriangles = 0
 
         self.PointColorCount = 0
-        self.PointColorTable = []
+        self.PointColors = numpy.empty((0, 3), dtype=numpy.float32)
 
         self.MaterialID = globalvars.INDEX_NONE
 
+        # Skin weights, padded to the largest influence count of the node. PhysiqueData is a (PhysiqueCount, width)
+        # array of PHYSIQUE_SUB_DATA_DTYPE records, PhysiqueSizes holds the number of influences stored for each vertex
+        # and PhysiqueNums the number of influences in use (at most raidflags.PHYSIQUE_MAX_WEIGHT).
         self.PhysiqueCount = 0
-        self.PhysiqueTable = []
+        self.PhysiqueData = numpy.zeros((0, 0), dtype=PHYSIQUE_SUB_DATA_DTYPE)
+        self.PhysiqueSizes = numpy.empty(0, dtype=numpy.int32)
+        self.PhysiqueNums = numpy.empty(0, dtype=numpy.int32)
 
         self.BoneCount = 0
         self.BoneTable = []
         self.BoneTableIndices = []
 
+        # Vertex indices (VERTEX_INDEX_DTYPE_V12 or VERTEX_INDEX_DTYPE) and material infos (MTRL_TABLE_INFO_DTYPE) are
+        # structured arrays, VertexIndexTable and MaterialInfoTable give object access to them.
         self.VertexIndexCount = 0
-        self.VertexIndexTable = []
+        self.VertexIndices = numpy.empty(0, dtype=VERTEX_INDEX_DTYPE)
 
         self.FaceIndexCount = 0
         self.FaceIndexTable = []
 
         self.MaterialInfoCount = 0
-        self.MaterialInfoTable = []
+        self.MaterialInfos = numpy.empty(0, dtype=MTRL_TABLE_INFO_DTYPE)
 
+        # Bounds computed from Points, and from version 13 on, the bounds stored in the file and whether both match
+        # (None if the file stores no bounds)
         self.BoundingBox = FBoundingBox()
+        self.StoredBoundingBox = None
+        self.BoundingBoxMatchesStored = None
+
+    @property
+    def PointsTable(self) -> FVectorTableView:
+        return FVectorTableView(self.Points)
+
+    @PointsTable.setter
+    def PointsTable(self, vectors) -> None:
+        self.Points = make_vector_array(vectors)
+
+    @property
+    def NormalsTable(self) -> FVectorTableView:
+        return FVectorTableView(self.Normals)
+
+    @NormalsTable.setter
+    def NormalsTable(self, vectors) -> None:
+        self.Normals = make_vector_array(vectors)
+
+    @property
+    def TangentTanTable(self) -> FVectorTableView:
+        return FVectorTableView(self.TangentTans)
+
+    @TangentTanTable.setter
+    def TangentTanTable(self, vectors) -> None:
+        self.TangentTans = make_vector_array(vectors, 4)
+
+    @property
+    def TangentBinTable(self) -> FVectorTableView:
+        return FVectorTableView(self.TangentBins)
+
+    @TangentBinTable.setter
+    def TangentBinTable(self, vectors) -> None:
+        self.TangentBins = make_vector_array(vectors)
+
+    @property
+    def TexCoordTable(self) -> FVectorTableView:
+        return FVectorTableView(self.TexCoords)
+
+    @TexCoordTable.setter
+    def TexCoordTable(self, vectors) -> None:
+        self.TexCoords = make_vector_array(vectors)
+
+    @property
+    def TexCoordExtraTable(self) -> FVectorTableView:
+        return FVectorTableView(self.TexCoordsExtra)
+
+    @TexCoordExtraTable.setter
+    def TexCoordExtraTable(self, vectors) -> None:
+        self.TexCoordsExtra = make_vector_array(vectors)
+
+    @property
+    def PointColorTable(self) -> FVectorTableView:
+        return FVectorTableView(self.PointColors)
+
+    @PointColorTable.setter
+    def PointColorTable(self, vectors) -> None:
+        self.PointColors = make_vector_array(vectors)
+
+    @property
+    def PolygonTable(self) -> FPolygonTableView:
+        return FPolygonTableView(self.PolygonOffsets, self.PolygonCorners, self.PolygonMaterialIDs)
+
+    @PolygonTable.setter
+    def PolygonTable(self, polygons) -> None:
+        self.PolygonOffsets, self.PolygonCorners, self.PolygonMaterialIDs = make_polygon_arrays(polygons)
+
+    @property
+    def PhysiqueTable(self) -> FPhysiqueTableView:
+        return FPhysiqueTableView(self.PhysiqueData, self.PhysiqueSizes, self.PhysiqueNums)
+
+    @PhysiqueTable.setter
+    def PhysiqueTable(self, physique_infos) -> None:
+        self.PhysiqueData, self.PhysiqueSizes, self.PhysiqueNums = make_physique_arrays(physique_infos)
+
+    @property
+    def VertexIndexTable(self) -> FRecordTableView:
+        # Records before version 15 have no uv2, it reads as -1 for them
+        return FRecordTableView(self.VertexIndices, FVertexIndex, {'uv2': -1})
+
+    @VertexIndexTable.setter
+    def VertexIndexTable(self, vertex_indices) -> None:
+        self.VertexIndices = make_record_array(vertex_indices, VERTEX_INDEX_DTYPE)
+
+    @property
+    def MaterialInfoTable(self) -> FRecordTableView:
+        return FRecordTableView(self.MaterialInfos, FMtrlTableInfo)
+
+    @MaterialInfoTable.setter
+    def MaterialInfoTable(self, material_infos) -> None:
+        self.MaterialInfos = make_record_array(material_infos, MTRL_TABLE_INFO_DTYPE)
 
     def calculate_local_bounding_box(self) -> None:
-        for i in range(len(self.PointsTable)):
-            self.BoundingBox.add(self.PointsTable[i])
+        self.BoundingBox = FBoundingBox.from_points(self.Points)
 
     def add_flag(self, flag) -> None:
         self.dwFlag |= flag
 
 
+class FParseContext:
+    """
+    Per-file parsing state handed to the elu/ani loaders. Keeping it per file instead of in module globals lets
+    several files be parsed at the same time, from threads or processes.
+    """
+
+    def __init__(self, file_path: str = globalvars.STRING_NONE, version: int = 0) -> None:
+        self.FilePath: str = file_path
+        self.Version: int = version
+        # Normalize rotation keys and keep consecutive keys in the same hemisphere, see aniparser.normalize_quaternions
+        self.NormalizeRotations: bool = False
+
+
 class FEluHeader:
 
     def __init__(self):
@@ -255,6 +679,8 @@ class FAniHeader:
 
 class FVecKey:
 
+    __slots__ = ('Frame', 'Vector')
+
     def __init__(self):
         self.Frame = 0
         self.Vector = None
@@ -262,6 +688,8 @@ class FVecKey:
 
 class FQuatKey:
 
+    __slots__ = ('Frame', 'Quat')
+
     def __init__(self):
         self.Frame = 0
         self.Quat = None
@@ -269,20 +697,96 @@ class FQuatKey:
 
 class FVisKey:
 
+    __slots__ = ('Frame', 'Vis')
+
     def __init__(self):
         self.Frame = 0
         self.Vis = 0
 
 
+# Key record of an animation track: frame and the components of the key value (position/scale, rotation quaternion
+# as x, y, z, w, or visibility)
+VEC_KEY_DTYPE = numpy.dtype([('frame', '<i4'), ('value', '<f4', (3,))])
+QUAT_KEY_DTYPE = numpy.dtype([('frame', '<i4'), ('value', '<f4', (4,))])
+VIS_KEY_DTYPE = numpy.dtype([('frame', '<i4'), ('value', '<f4')])
+KEY_TRACK_DTYPES = {3: VEC_KEY_DTYPE, 4: QUAT_KEY_DTYPE, 1: VIS_KEY_DTYPE}
+
+
+class FKeyTableView:
+    """
+    Read-only sequence view of the keys of an FAnimationTrack as FVecKey/FQuatKey/FVisKey objects, including the
+    repeated last key. Kept so that code written against the old lists of keys keeps working.
+    """
+
+    def __init__(self, track) -> None:
+        self._keys = track.get_keys()
+        self._components = track.Components
+
+    def _make_key(self, frame: int, value):
+        if self._components == 1:
+            key = FVisKey()
+            key.Vis = value
+        elif self._components == 4:
+            key = FQuatKey()
+            key.Quat = FQuaternion(value)
+        else:
+            key = FVecKey()
+            key.Vector = FVector(value)
+        key.Frame = frame
+        return key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._make_key(frame, value) for frame, value in self._keys[index].tolist()]
+        return self._make_key(*self._keys[index].tolist())
+
+    def __iter__(self):
+        for frame, value in self._keys.tolist():
+            yield self._make_key(frame, value)
+
+
 class FAnimationTrack:
+    """
+    Key track of an ani node. Keys is an array of KEY_TRACK_DTYPES[Components] records, in file order.\n
+    Position and rotation tracks repeat their last key once, the way the engine plays them back. The repeated key is
+    not stored in Keys, RepeatLastKey flags it instead. Count, Data and get_keys() include it.
+    """
 
-    def __init__(self):
-        self.Count = 0
-        self.Data = []
+    def __init__(self, components: int = 3):
+        self.Components: int = components
+        self.Keys = numpy.empty(0, dtype=KEY_TRACK_DTYPES[components])
+        self.RepeatLastKey: bool = False
+
+    def set_keys(self, frames, values, repeat_last_key: bool = False) -> None:
+        self.Keys = numpy.empty(len(frames), dtype=KEY_TRACK_DTYPES[self.Components])
+        self.Keys['frame'] = frames
+        self.Keys['value'] = values
+        self.RepeatLastKey = repeat_last_key
+
+    def get_keys(self) -> numpy.ndarray:
+        """
+        Returns the keys, with the last key repeated if RepeatLastKey is set
+        """
+        if self.RepeatLastKey and len(self.Keys):
+            return numpy.concatenate((self.Keys, self.Keys[-1:]))
+        return self.Keys
+
+    @property
+    def Count(self) -> int:
+        return len(self.Keys) + (1 if self.RepeatLastKey and len(self.Keys) else 0)
+
+    @property
+    def Data(self) -> FKeyTableView:
+        return FKeyTableView(self)
 
 
 class FAnimType:
 
+    __slots__ = ('Type', 'CountType', 'Count')
+
     def __init__(self, int_tuple: tuple[int, ...]):
         self.Type: int = int_tuple[0]
         self.CountType: int = int_tuple[1]
@@ -302,17 +806,18 @@ class FAniNode:
         self.Name = globalvars.STRING_NONE
         self.ParentName = globalvars.STRING_NONE
         self.VertexCount = 0  # Vertex Group (mesh-node) Count
-        self.VertexTable = []
+        # Vertex positions of every vertex animation frame, (VertexCount, Vertex_V_Count, 3)
+        self.VertexTable = numpy.empty((0, 0, 3), dtype=numpy.float32)
 
         self.Vertex_V_Count = 0  # Vertex Point Count
-        self.VertexFrame = []
+        self.VertexFrame = numpy.empty(0, dtype=numpy.uint32)
 
         self.LocalMatrix = None
 
-        self.PositionKeyTrack = FAnimationTrack()
-        self.RotationKeyTrack = FAnimationTrack()
-        self.ScaleKeyTrack = FAnimationTrack()
-        self.VisKeyTrack = FAnimationTrack()
+        self.PositionKeyTrack = FAnimationTrack(3)
+        self.RotationKeyTrack = FAnimationTrack(4)
+        self.ScaleKeyTrack = FAnimationTrack(3)
+        self.VisKeyTrack = FAnimationTrack(1)
 
         self.BoundingBox = FBoundingBox()
 
@@ -360,3 +865,22 @@ def convert_short_to_float(short_tuple) -> tuple[float, ...]:
     y = half_to_float(short_tuple[1])
     z = half_to_float(short_tuple[2])
     return x, y, z
+
+
+@lru_cache(maxsize=None)
+def get_half_to_float_table() -> numpy.ndarray:
+    """
+    Float32 value of every half float bit pattern, built once from half_to_float() so that table lookups match it
+    bit for bit, denormals, inf and NaN included. numpy's own float16 cast is not used, whether it quiets signaling
+    NaNs the way half_to_float() does depends on the cpu.
+    """
+    table = numpy.array([half_to_float(value) for value in range(0x10000)], dtype=numpy.float32)
+    table.flags.writeable = False
+    return table
+
+
+def convert_short_array_to_float(shorts: numpy.ndarray) -> numpy.ndarray:
+    """
+    Converts an array of half floats stored as unsigned shorts to a float32 array of the same shape
+    """
+    return get_half_to_float_table()[shorts.astype(numpy.uint16, copy=False)]
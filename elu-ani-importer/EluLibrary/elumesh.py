@@ -9,15 +9,17 @@
 """
 
 import os
+import struct
 import eluparser
 import raidflags
 import binaryreader
 import errorhandling
 import eluparser
-import globalvars
+import fileprobe
 import commonfunctions
 from datatypes import FEluHeader
 from datatypes import FEluNode
+from datatypes import FParseContext
 
 
 class FEluMesh:
@@ -25,12 +27,26 @@ class FEluMesh:
     Contains all the data read from a single Elu file
     """
 
-    def __init__(self, file_path: str) -> None:
+    def __init__(self, file_path: str, lazy: bool = False, skeleton_only: bool = False, memory_budget: int = None,
+                 over_budget_policy: fileprobe.EMemoryBudgetPolicy = fileprobe.EMemoryBudgetPolicy.SwitchToLazy) -> None:
+        """
+        @param file_path Path of the elu file\n
+        @param lazy Only index the nodes while loading, each node table is decoded on first access. See
+        eluparser.FLazyEluNode.\n
+        @param skeleton_only Only read the node hierarchy and matrices, geometry is skipped and left empty. Enough
+        for draw_elu_skeleton() and skeleton checks.\n
+        @param memory_budget Maximum number of bytes the parsed nodes may take up, estimated from the table counts
+        before anything is decoded (see fileprobe.FEluProbe.estimate_memory()). default=None, no limit.\n
+        @param over_budget_policy What to do with files over memory_budget. SwitchToLazy loads them lazily, Raise
+        raises errorhandling.FileTooLargeError.\n
+        """
         self.EluHeader = FEluHeader()
         self.EluMeshNodes = []
         self.FilePath = file_path
         self.SourceDir = os.path.dirname(file_path)
         self.SourceFile = os.path.basename(file_path)
+        self.Lazy = lazy
+        self.SkeletonOnly = skeleton_only
         try:
             commonfunctions.get_file_extension(self.FilePath) == '.elu' \
                                                                  "Assertion Failed: File extension is not .elu, " \
@@ -38,47 +54,106 @@ class FEluMesh:
                 file_path)
         except AssertionError as err:
             errorhandling.handle_assertion_error(err)
-        self.EluFileStream = open(file_path, 'rb')
+        if memory_budget is not None and not skeleton_only:
+            estimated_size = fileprobe.estimate_elu_memory(file_path)
+            if estimated_size > memory_budget:
+                if over_budget_policy == fileprobe.EMemoryBudgetPolicy.Raise:
+                    raise errorhandling.FileTooLargeError(file_path, estimated_size, memory_budget)
+                self.Lazy = True
+        # Lazy nodes keep decoding from the stream, map the file so that it is paged in on demand instead of read
+        self.EluFileStream = binaryreader.FBinaryCursor.from_file(file_path, use_mmap=self.Lazy)
         self._load_and_parse_elu_file()
 
+    @classmethod
+    def from_parse_result(cls, result) -> 'FEluMesh':
+        """
+        Builds an FEluMesh from a batchparser.FEluParseResult, for instance one read back from meshcache, without
+        opening the elu file\n
+        """
+        elu_mesh = cls.__new__(cls)
+        elu_mesh.EluHeader = FEluHeader()
+        elu_mesh.EluHeader.Signature, elu_mesh.EluHeader.Version = result.signature, result.version
+        elu_mesh.EluHeader.MaterialNum, elu_mesh.EluHeader.MeshNum = result.material_num, result.mesh_num
+        elu_mesh.EluMeshNodes = result.to_elu_nodes()
+        elu_mesh.FilePath = result.file_path
+        elu_mesh.SourceDir = os.path.dirname(result.file_path)
+        elu_mesh.SourceFile = os.path.basename(result.file_path)
+        elu_mesh.Lazy = False
+        elu_mesh.SkeletonOnly = False
+        elu_mesh.EluFileStream = None
+        elu_mesh.ParseContext = FParseContext(result.file_path, result.version)
+        return elu_mesh
+
     def _load_and_parse_elu_file(self):
-        self.EluHeader.Signature = binaryreader.read_unsigned_int(self.EluFileStream, 1)[0]
-        self.EluHeader.Version = binaryreader.read_unsigned_int(self.EluFileStream, 1)[0]
-        self.EluHeader.MaterialNum = binaryreader.read_int(self.EluFileStream, 1)[0]
-        self.EluHeader.MeshNum = binaryreader.read_int(self.EluFileStream, 1)[0]
-        globalvars.CurrentEluFileVersion = self.EluHeader.Version
-
-        if self.EluHeader.Signature != raidflags.EXPORTER_SIG:
-            # @todo add signature error
-            pass
+        read_elu_header(self.EluHeader, self.EluFileStream, self.FilePath)
+        self.ParseContext = FParseContext(self.FilePath, self.EluHeader.Version)
 
         if self.EluHeader.Version != raidflags.EXPORTER_CURRENT_MESH_VER:
             # @todo add warning -  elu not latest version
             pass
 
-        loader_obj = None
-        if globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER20:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v20()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER18:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v18()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER17:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v17()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER16:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v16()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER15:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v15()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER14:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v14()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER13:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v13()
-        elif globalvars.CurrentEluFileVersion == raidflags.EXPORTER_MESH_VER12:
-            loader_obj = eluparser.FEluNodeLoaderImpl_v12()
-        else:
-            # @todo elu version error
-            pass
+        loader_obj = create_elu_node_loader(self.EluHeader, self.ParseContext)
 
         for i in range(self.EluHeader.MeshNum):
-            elu_node = FEluNode()
-            loader_obj.Load(elu_node, self.EluFileStream)
+            if self.SkeletonOnly:
+                elu_node = FEluNode()
+                loader_obj.LoadSkeleton(elu_node, self.EluFileStream)
+            elif self.Lazy:
+                elu_node = eluparser.FLazyEluNode(loader_obj, self.EluFileStream)
+            else:
+                elu_node = FEluNode()
+                loader_obj.Load(elu_node, self.EluFileStream)
             self.EluMeshNodes.append(elu_node)
         return
+
+
+def read_elu_header(elu_header: FEluHeader, file_stream, file_path: str = None) -> None:
+    try:
+        elu_header.Signature = binaryreader.read_unsigned_int(file_stream, 1)[0]
+        elu_header.Version = binaryreader.read_unsigned_int(file_stream, 1)[0]
+        elu_header.MaterialNum = binaryreader.read_int(file_stream, 1)[0]
+        elu_header.MeshNum = binaryreader.read_int(file_stream, 1)[0]
+    except struct.error as err:
+        errorhandling.handle_struct_unpack_error(err, FParseContext(file_path), section='Header')
+
+
+def create_elu_node_loader(elu_header: FEluHeader, context: FParseContext):
+    """
+    Checks the signature and version of elu_header\n
+    @return Returns the node loader of the elu version, see eluparser.create_node_loader()\n
+    """
+    if elu_header.Signature != raidflags.EXPORTER_SIG:
+        raise errorhandling.InvalidFileError("Not an elu file, signature {0:#x}".format(elu_header.Signature),
+                                             context.FilePath, section='Header')
+    loader_obj = eluparser.create_node_loader(context)
+    if loader_obj is None:
+        raise errorhandling.InvalidFileError("Unsupported elu version {0:#x}".format(elu_header.Version),
+                                             context.FilePath, section='Header')
+    return loader_obj
+
+
+def iter_elu_nodes(file_path: str, skeleton_only: bool = False, elu_header: FEluHeader = None):
+    """
+    Yields the nodes of an elu file one at a time, as they are parsed. Unlike FEluMesh, neither the nodes nor the
+    file content are kept around, so a node can be processed and dropped before the next one is read and files
+    larger than memory can be streamed.\n
+    The file is read through a buffered file object and closed once the generator is exhausted or closed.\n
+    @param file_path Path of the elu file\n
+    @param skeleton_only Only read the node hierarchy and matrices, see FEluMesh\n
+    @param elu_header Optional FEluHeader, filled in with the header of the file before the first node is yielded\n
+    @return Generator of FEluNode objects, in file order. Raises errorhandling.InvalidFileError if the file is not
+    an elu file or its version is not supported.\n
+    """
+    if elu_header is None:
+        elu_header = FEluHeader()
+    with open(file_path, 'rb') as file_stream:
+        read_elu_header(elu_header, file_stream, file_path)
+        loader_obj = create_elu_node_loader(elu_header, FParseContext(file_path, elu_header.Version))
+
+        for i in range(elu_header.MeshNum):
+            elu_node = FEluNode()
+            if skeleton_only:
+                loader_obj.LoadSkeleton(elu_node, file_stream)
+            else:
+                loader_obj.Load(elu_node, file_stream)
+            yield elu_node
@@ -9,712 +9,490 @@
 This module contains functions for loading and verifying elu files
 """
 
+import functools
 import struct
+import numpy
 import raidflags
 import datatypes
 import binaryreader
+import readplan
 import filelogger
 import globalvars
 import errorhandling
-# from abc import ABC, abstractmethod
+from numpy.lib.stride_tricks import sliding_window_view
 
 
-class FEluNodeLoaderImpl():
-    
-    def __init__(self):
-        # super().__init__()
-        pass
-    
-    # @abstractmethod
-    def Load(self, Node, FileStream, Offset=None):
-        pass
-
-
-class FEluNodeLoaderImpl_v12(FEluNodeLoaderImpl):
+def read_polygon_table(Node, FileStream, CornerDtype):
     """
-    Version 12 of elu node loader
+    Reads the polygon table of Node into its CSR arrays (PolygonOffsets, PolygonCorners, PolygonMaterialIDs).\n
+    Every polygon is stored as an int degree, degree corner records of CornerDtype and a short material id.\n
+    Node.FaceCount and Node.TotalDegrees must have been read already.\n
+    @param Node EluNode that we need to write data to\n
+    @param FileStream Binary data stream.\n
+    @param CornerDtype datatypes.FACE_SUB_DATA_DTYPE_V12 or datatypes.FACE_SUB_DATA_DTYPE\n
+    @return Returns False if the degrees stored in the table don't add up to Node.TotalDegrees\n
     """
-
-    def __init__(self):
-        super().__init__()
-
-    def Load(self, Node, FileStream, Offset=None):
-        """
-        This function reads data from FileStream and writes it to Node\n
-        @param Node EluNode that we need to write data to, from FileStream\n
-        @param FileStream Binary data stream. // Constant\n
-        @param Offset Cursor offset in FileStream\n
-        @return Returns current offset of cursor\n
-        """
-        self.LoadName(Node, FileStream, Offset)
-        self.LoadInfo(Node, FileStream, Offset)
-        self.LoadVertex(Node, FileStream, Offset)
-        self.LoadFace(Node, FileStream, Offset)
-        self.LoadVertexInfo(Node, FileStream, Offset)
-        self.LoadEtc(Node, FileStream, Offset)
-        # @todo set BoundingBox
-    
-    def LoadName(self, Node, FileStream, Offset):
+    FaceCount = Node.FaceCount
+    TotalDegrees = Node.TotalDegrees
+    CornerSize = CornerDtype.itemsize
+    # 4 bytes for degree and 2 bytes for material id per polygon. This only holds if TotalDegrees is right,
+    # which is verified below.
+    TableSize = FaceCount * 6 + TotalDegrees * CornerSize
+    Table = binaryreader.read_array(FileStream, numpy.uint8, TableSize)
+
+    Degree = int(Table[:4].view('<i4')[0]) if TableSize >= 4 else 0
+    if Degree > 0 and FaceCount * Degree == TotalDegrees:
+        # Every polygon has the same degree (the usual all-triangles case), decode the table as one record array
+        RecordDtype = numpy.dtype([('Vertices', '<i4'), ('Corners', CornerDtype, (Degree,)), ('MaterialID', '<i2')])
+        Records = Table.view(RecordDtype)
+        if (Records['Vertices'] == Degree).all():
+            Node.PolygonOffsets = numpy.arange(0, TotalDegrees + 1, Degree, dtype=numpy.int32)
+            Node.PolygonCorners = Records['Corners'].reshape(-1)
+            Node.PolygonMaterialIDs = Records['MaterialID'].copy()
+            return True
+
+    # Mixed degrees, walk the degrees to find where each polygon starts, then gather all corners at once
+    Degrees = numpy.empty(FaceCount, dtype=numpy.int64)
+    UnpackDegree = binaryreader.get_struct('<', 'i', 1).unpack_from
+    Position = 0
+    for i in range(FaceCount):
+        if Position + 4 > TableSize:
+            return False
+        Degree = UnpackDegree(Table, Position)[0]
+        if Degree < 0:
+            return False
+        Degrees[i] = Degree
+        Position += 6 + Degree * CornerSize
+    if Position != TableSize:
+        return False
+
+    Offsets = numpy.zeros(FaceCount + 1, dtype=numpy.int64)
+    numpy.cumsum(Degrees, out=Offsets[1:])
+
+    # All fields are unsigned shorts, so the table can be addressed in 2 byte words
+    Words = Table.view('<u2')
+    FieldCount = len(CornerDtype.names)
+    FaceIndices = numpy.arange(FaceCount)
+    CornerStarts = FaceIndices * 3 + Offsets[:-1] * FieldCount + 2
+    CornerFaces = numpy.repeat(FaceIndices, Degrees)
+    CornerWords = CornerStarts[CornerFaces] + (numpy.arange(TotalDegrees) - Offsets[:-1][CornerFaces]) * FieldCount
+    Corners = sliding_window_view(Words, FieldCount)[CornerWords]
+
+    Node.PolygonOffsets = Offsets.astype(numpy.int32)
+    Node.PolygonCorners = Corners.view(CornerDtype).reshape(-1)
+    Node.PolygonMaterialIDs = Words[CornerStarts + Degrees * FieldCount].view('<i2')
+    return True
+
+
+def read_physique_table(Node, FileStream):
+    """
+    Reads the physique (skin weight) table of Node into its padded arrays (PhysiqueData, PhysiqueSizes,
+    PhysiqueNums).\n
+    Every vertex is stored as an int size followed by size PHYSIQUE_SUB_DATA_DTYPE records. Vertices with more than
+    raidflags.PHYSIQUE_MAX_WEIGHT influences get their influences sorted by weight, heaviest first, and the first
+    PHYSIQUE_MAX_WEIGHT weights divided by the weight sum. Both steps run on all such vertices at once.\n
+    Node.PhysiqueCount must have been read already.\n
+    """
+    RecordDtype = datatypes.PHYSIQUE_SUB_DATA_DTYPE
+    VertexCount = Node.PhysiqueCount
+    Start = FileStream.tell()
+    Sizes = binaryreader.scan_counted_records(FileStream, VertexCount, RecordDtype.itemsize)
+    Table = binaryreader.read_array(FileStream, numpy.uint8, FileStream.tell() - Start, offset=Start)
+
+    Offsets = numpy.zeros(VertexCount + 1, dtype=numpy.int64)
+    numpy.cumsum(Sizes, out=Offsets[1:])
+    EntryCount = int(Offsets[-1])
+    Width = int(Sizes.max(initial=0))
+    PhysiqueData = numpy.zeros((VertexCount, Width), dtype=RecordDtype)
+
+    if EntryCount:
+        # Sizes and records are multiples of 4 bytes, so the table can be addressed in 4 byte words
+        Words = Table.view('<u4')
+        Vertices = numpy.arange(VertexCount)
+        EntryStarts = Vertices + Offsets[:-1] * 2 + 1
+        EntryVertices = numpy.repeat(Vertices, Sizes)
+        EntryColumns = numpy.arange(EntryCount) - Offsets[:-1][EntryVertices]
+        EntryWords = EntryStarts[EntryVertices] + EntryColumns * 2
+        Entries = sliding_window_view(Words, 2)[EntryWords].view(RecordDtype).reshape(-1)
+        PhysiqueData[EntryVertices, EntryColumns] = Entries
+
+    Nums = Sizes.astype(numpy.int32)
+    MaxWeight = raidflags.PHYSIQUE_MAX_WEIGHT
+    Overweight = Sizes > MaxWeight
+    if Overweight.any():
+        Rows = PhysiqueData[Overweight]
+        Valid = numpy.arange(Width) < Sizes[Overweight][:, None]
+        # Padding sorts behind every stored influence
+        Order = numpy.argsort(-numpy.where(Valid, Rows['weight'], -numpy.inf), axis=1, kind='stable')
+        Rows = numpy.take_along_axis(Rows, Order, axis=1)
+        WeightSums = numpy.where(Valid, Rows['weight'], 0.0).sum(axis=1, dtype=numpy.float64)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            Rows['weight'][:, :MaxWeight] = Rows['weight'][:, :MaxWeight] / WeightSums[:, None]
+        PhysiqueData[Overweight] = Rows
+        Nums[Overweight] = MaxWeight
+
+    Node.PhysiqueData = PhysiqueData
+    Node.PhysiqueSizes = Sizes.astype(numpy.int32)
+    Node.PhysiqueNums = Nums
+
+
+def read_faces(Node, FileStream, CornerDtype):
+    """
+    Reads TotalDegrees, TotalTriangles and the polygon table of Node, Node.FaceCount must have been read already\n
+    """
+    if Node.FaceCount:
+        Node.TotalDegrees, Node.TotalTriangles = binaryreader.read_int(FileStream, 2)
+        IsValid = read_polygon_table(Node, FileStream, CornerDtype)
         try:
-            Node.NodeName = binaryreader.read_word(FileStream)
-            Node.NodeParentName = binaryreader.read_word(FileStream)
-            Node.ParentNodeID = binaryreader.read_int(FileStream, 1)[0]
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+            assert IsValid and Node.TotalDegrees == Node.PolygonOffsets[-1], \
+            "Assertion Failed: TotalDegrees value does not match expected value for node - {}".format(Node.NodeName)
+        except AssertionError as err:
+            errorhandling.handle_assertion_error(err, node_name=Node.NodeName, section='Face')
 
-    def LoadInfo(self, Node, FileStream, Offset):
-        try:
-            Node.dwFlag = binaryreader.read_unsigned_int(FileStream, 1)[0]
-            try:
-                Node.MeshAlign = datatypes.RMeshAlign(binaryreader.read_int(FileStream, 1)[0])
-            except ValueError as er:
-                Message = "Node.MeshAlign value is out of allowed range."
-                filelogger.add_log(globalvars.LogFileStream, Message, filelogger.ELogMessageType.Log_Warning)
-            
-            if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER11:
-                # Unused data
-                AniPartsType = binaryreader.read_int(FileStream, 1)[0]
-                PartsPosInfoType = binaryreader.read_int(FileStream, 1)[0]
-                PartsType = binaryreader.read_int(FileStream, 1)[0]
-            
-            Node.LocalMatrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
-            if globalvars.CurrentEluFileVersion >= raidflags.EXPORTER_MESH_VER11:
-                Node.BaseVisibility = binaryreader.read_int(FileStream, 1)[0]
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+def skip_faces(Node, FileStream, CornerDtype):
+    """
+    Skips the polygon table of Node using FaceCount and TotalDegrees, without walking the polygons\n
+    """
+    if Node.FaceCount:
+        Node.TotalDegrees, Node.TotalTriangles = binaryreader.read_int(FileStream, 2)
+        binaryreader.skip_bytes(FileStream, Node.FaceCount * 6 + Node.TotalDegrees * CornerDtype.itemsize)
 
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-            
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-            
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Vec4 = datatypes.FVector4.from_vec3(Vec)
-                Node.TangentTanTable.append(Vec4)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
 
-    def LoadFace(self, Node, FileStream, Offset):
-        try:
-            Node.FaceCount = binaryreader.read_int(FileStream, 1)[0]
-            if(Node.FaceCount):
-                if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER12:
-                    for i in range(Node.FaceCount):
-                        MeshPolygonData = datatypes.FMeshPolygonData()
-                        MeshPolygonData.Vertices = 3
-                        for j in range(j):
-                            UnsignedShorts = binaryreader.read_unsigned_short(FileStream, 5)
-                            FaceSubData = datatypes.FFaceSubData()
-                            FaceSubData.p = UnsignedShorts[0]
-                            FaceSubData.uv = UnsignedShorts[1]
-                            FaceSubData.n = UnsignedShorts[2]
-                            FaceSubData.uv2 = -1
-                            FaceSubData.n_tan = UnsignedShorts[3]
-                            FaceSubData.n_bin = UnsignedShorts[4]
-                            MeshPolygonData.FaceSubDatas.append(FaceSubData)
-                        MeshPolygonData.MaterialID = binaryreader.read_short(FileStream, 1)[0]
-                        Node.PolygonTable.append(MeshPolygonData)
-                    Node.TotalDegrees = Node.FaceCount * 3
-                    Node.TotalTriangles = Node.FaceCount
-                else:
-                    Node.TotalDegrees = binaryreader.read_int(FileStream, 1)[0]
-                    Node.TotalTriangles = binaryreader.read_int(FileStream, 1)[0]
-                    for i in range(Node.FaceCount):
-                        MeshPolygonData = datatypes.FMeshPolygonData()
-                        MeshPolygonData.Vertices = binaryreader.read_int(FileStream, 1)[0]
-                        for j in range(MeshPolygonData.Vertices):
-                            UnsignedShorts = binaryreader.read_unsigned_short(FileStream, 5)
-                            FaceSubData = datatypes.FFaceSubData()
-                            FaceSubData.p = UnsignedShorts[0]
-                            FaceSubData.uv = UnsignedShorts[1]
-                            FaceSubData.n = UnsignedShorts[2]
-                            FaceSubData.uv2 = -1
-                            FaceSubData.n_tan = UnsignedShorts[3]
-                            FaceSubData.n_bin = UnsignedShorts[4]
-                            MeshPolygonData.FaceSubDatas.append(FaceSubData)
-                        MeshPolygonData.MaterialID = binaryreader.read_short(FileStream, 1)[0]
-                        Node.PolygonTable.append(MeshPolygonData)
-                    try:
-                        assert Node.TotalDegrees == sum(len(MeshPolygonData.FaceSubDatas) \
-                        for MeshPolygonData in Node.PolygonTable), \
-                        "Assertion Failed: TotalDegrees value does not match expected value for node - {}".format(Node.NodeName)
-                    except AssertionError as err:
-                        errorhandling.handle_assertion_error(err)
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
-
-    def LoadVertexInfo(self, Node, FileStream, Offset):
-        try:
-            Node.PointColorCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointColorCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointColorTable.append(Vec)
-            
-            if Node.PointsCount == 0 or Node.FaceCount == 0:
-                Node.add_flag(raidflags.RM_FLAG_DUMMY_MESH)
-            
-            Node.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-            Node.PhysiqueCount = binaryreader.read_int(FileStream, 1)[0]
-
-            if Node.PhysiqueCount:
-                try:
-                    assert Node.PointsCount == Node.PhysiqueCount, \
-                    "Assertion Failed: Points Count is not same as Physique Count - {0}".format(Node.NodeName)
-                except AssertionError as err:
-                    errorhandling.handle_assertion_error(err)
-                for i in range(Node.PhysiqueCount):
-                    Size = binaryreader.read_int(FileStream, 1)[0]
-                    PhysiqueInfo = datatypes.FPhysiqueInfo()
-                    for j in range (Size):
-                        PhysiqueSubData = datatypes.FPhysiqueSubData()
-                        PhysiqueSubData.cid = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                        PhysiqueSubData.pid = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                        PhysiqueSubData.weight = binaryreader.read_float(FileStream, 1)[0]
-                        PhysiqueInfo.PhysiqueSubDatas.append(PhysiqueSubData)
-                    PhysiqueInfo.Num = len(PhysiqueInfo.PhysiqueSubDatas)
-                    Node.PhysiqueTable.append(PhysiqueInfo)
-
-                    if Size > raidflags.PHYSIQUE_MAX_WEIGHT:
-                        for m in range(Size):
-                            for n in range(m + 1, Size):
-                                if PhysiqueInfo.PhysiqueSubDatas[m].weight < PhysiqueInfo.PhysiqueSubDatas[n].weight:
-                                    Temp = datatypes.FPhysiqueSubData()
-                                    Temp = PhysiqueInfo.PhysiqueSubDatas[m]
-                                    PhysiqueInfo.PhysiqueSubDatas[m] = PhysiqueInfo.PhysiqueSubDatas[n]
-                                    PhysiqueInfo.PhysiqueSubDatas[n] = Temp
-
-                        fSum3 = sum(PhysiqueSubData.weight for PhysiqueSubData in PhysiqueInfo.PhysiqueSubDatas)
-                        PhysiqueInfo.PhysiqueSubDatas[0].weight = PhysiqueInfo.PhysiqueSubDatas[0].weight / fSum3
-                        PhysiqueInfo.PhysiqueSubDatas[1].weight = PhysiqueInfo.PhysiqueSubDatas[1].weight / fSum3
-                        PhysiqueInfo.PhysiqueSubDatas[2].weight = PhysiqueInfo.PhysiqueSubDatas[2].weight / fSum3
-                        PhysiqueInfo.Num = 3
-                    
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
-    
-    def LoadEtc(self, Node, FileStream, Offset):
+def read_physique(Node, FileStream):
+    """
+    Reads the physique table of Node, Node.PointsCount and Node.PhysiqueCount must have been read already\n
+    """
+    if Node.PhysiqueCount:
         try:
-            Node.BoneCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.BoneCount):
-                Matrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
-                Node.BoneTable.append(Matrix)
-            
-            for i in range(Node.BoneCount):
-                BoneIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                Node.BoneTableIndices.append(BoneIndex)
-            
-            Node.VertexIndexCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.VertexIndexCount):
-                VertexIndex = datatypes.FVertexIndex()
-                UnsignedShorts = binaryreader.read_unsigned_short(FileStream, 5)
-                VertexIndex.p = UnsignedShorts[0]
-                VertexIndex.n = UnsignedShorts[1]
-                VertexIndex.uv = UnsignedShorts[2]
-                VertexIndex.uv2 = -1
-                VertexIndex.n_tan = UnsignedShorts[3]
-                VertexIndex.n_bin = UnsignedShorts[4]
-
-            if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER12:
-                for i in range(Node.FaceCount):
-                    for j in range(3):
-                        FaceIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                        Node.FaceIndexTable.append(FaceIndex)  
-                Node.FaceIndexCount = Node.FaceCount * 3                  
-            else:
-                PrimitiveType = binaryreader.read_int(FileStream, 1)[0]
-                Node.FaceIndexCount = binaryreader.read_int(FileStream, 1)[0]
-                for i in range(Node.FaceIndexCount):
-                    FaceIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    Node.FaceIndexTable.append(FaceIndex)
-
-            Node.MaterialInfoCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.MaterialInfoCount):
-                MtrlTableInfo = datatypes.FMtrlTableInfo()
-                if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER9:
-                    MtrlTableInfo.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-                    MtrlTableInfo.Offset = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.Count = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.SubMaterialIDForDrawMasking = binaryreader.read_int(FileStream, 1)[0]
-                else:
-                    MtrlTableInfo.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-                    MtrlTableInfo.Offset = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.Count = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.SubMaterialIDForDrawMasking = binaryreader.read_int(FileStream, 1)[0]
-                Node.MaterialInfoTable.append(MtrlTableInfo)
-            
-            # @todo GetBipID
+            assert Node.PointsCount == Node.PhysiqueCount, \
+            "Assertion Failed: Points Count is not same as Physique Count - {0}".format(Node.NodeName)
+        except AssertionError as err:
+            errorhandling.handle_assertion_error(err, node_name=Node.NodeName, section='VertexInfo')
+        read_physique_table(Node, FileStream)
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
 
+def skip_physique(Node, FileStream):
+    if Node.PhysiqueCount:
+        binaryreader.scan_counted_records(FileStream, Node.PhysiqueCount, datatypes.PHYSIQUE_SUB_DATA_DTYPE.itemsize)
 
-class FEluNodeLoaderImpl_v13(FEluNodeLoaderImpl_v12):
 
-    def __init__(self):
-        super().__init__()
-    
-    def Load(self, Node, FileStream, Offset=None):
-        self.LoadName(Node, FileStream, Offset)
-        self.LoadInfo(Node, FileStream, Offset)
-        self.LoadVertex(Node, FileStream, Offset)
-        self.LoadFace(Node, FileStream, Offset)
-        self.LoadVertexInfo(Node, FileStream, Offset)
-        self.LoadEtc(Node, FileStream, Offset)
-    
-    def LoadEtc(self, Node, FileStream, Offset):
-        super().LoadEtc(Node, FileStream, Offset)
-        try:
-            Node.BoundingBox.vmin = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-            Node.BoundingBox.vmax = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+def pad_tangents(Tangents):
+    """
+    Versions before 16 store 3 floats per tangent, this pads them to (count, 4) with W set to 1\n
+    """
+    PaddedTangents = numpy.ones((len(Tangents), 4), dtype=numpy.float32)
+    PaddedTangents[:, :3] = Tangents
+    return PaddedTangents
 
 
-class FEluNodeLoaderImpl_v14(FEluNodeLoaderImpl_v13):
-    
-    def __init__(self):
-        super().__init__()
-    
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            dwFVF = binaryreader.read_unsigned_int(FileStream, 1)[0]
-
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-                
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-            
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Vec4 = datatypes.FVector4.from_vec3(Vec)
-                Node.TangentTanTable.append(Vec4)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
-                        
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+def make_matrix_list(Matrices):
+    return [datatypes.FMatrix(Matrix) for Matrix in Matrices.tolist()]
 
 
-class FEluNodeLoaderImpl_v15(FEluNodeLoaderImpl_v14):
-    
-    def __init__(self):
-        super().__init__()
-    
-    def LoadFace(self, Node, FileStream, Offset):
-        try:
-            Node.FaceCount = binaryreader.read_int(FileStream, 1)[0]
-            if(Node.FaceCount):
-                Node.TotalDegrees = binaryreader.read_int(FileStream, 1)[0]
-                Node.TotalTriangles = binaryreader.read_int(FileStream, 1)[0]
-                for i in range(Node.FaceCount):
-                    MeshPolygonData = datatypes.FMeshPolygonData()
-                    MeshPolygonData.Vertices = binaryreader.read_int(FileStream, 1)[0]
-                    for j in range(MeshPolygonData.Vertices):
-                        UnsignedShorts = binaryreader.read_unsigned_short(FileStream, 6)
-                        FaceSubData = datatypes.FFaceSubData()
-                        FaceSubData.p = UnsignedShorts[0]
-                        FaceSubData.uv = UnsignedShorts[1]
-                        FaceSubData.uv2 = UnsignedShorts[2]
-                        FaceSubData.n = UnsignedShorts[3]
-                        FaceSubData.n_tan = UnsignedShorts[4]
-                        FaceSubData.n_bin = UnsignedShorts[5]
-                        MeshPolygonData.FaceSubDatas.append(FaceSubData)
-                    MeshPolygonData.MaterialID = binaryreader.read_short(FileStream, 1)[0]
-                    Node.PolygonTable.append(MeshPolygonData)
-                try:
-                    assert Node.TotalDegrees == sum(len(MeshPolygonData.FaceSubDatas) \
-                    for MeshPolygonData in Node.PolygonTable), \
-                    "Assertion Failed: TotalDegrees value does not match expected value for node - {}".format(Node.NodeName)
-                except AssertionError as err:
-                    errorhandling.handle_assertion_error(err)
-                    
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+def make_bounding_box(Values):
+    return datatypes.FBoundingBox(datatypes.FVector(Values[:3]), datatypes.FVector(Values[3:]))
 
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            dwFVF = binaryreader.read_unsigned_int(FileStream, 1)[0]
-            LightMapID = binaryreader.read_int(FileStream, 1)[0]
-
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-            
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Vec4 = datatypes.FVector4.from_vec3(Vec)
-                Node.TangentTanTable.append(Vec4)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
-
-            LightMapTexCoordTableCount = binaryreader.read_int(FileStream, 1)[0]
-            FileStream.seek(FileStream.tell() + 3 * 4 * LightMapTexCoordTableCount)
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
 
-    def LoadEtc(self, Node, FileStream, Offset):
-        try:
-            Node.BoneCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.BoneCount):
-                Matrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
-                Node.BoneTable.append(Matrix)
-            
-            for i in range(Node.BoneCount):
-                BoneIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                Node.BoneTableIndices.append(BoneIndex)
-            
-            Node.VertexIndexCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.VertexIndexCount):
-                VertexIndex = datatypes.FVertexIndex()
-                UnsignedShorts = binaryreader.read_unsigned_short(FileStream, 6)
-                VertexIndex.p = UnsignedShorts[0]
-                VertexIndex.n = UnsignedShorts[1]
-                VertexIndex.uv = UnsignedShorts[2]
-                VertexIndex.uv2 = UnsignedShorts[3]
-                VertexIndex.n_tan = UnsignedShorts[4]
-                VertexIndex.n_bin = UnsignedShorts[5]
-                Node.VertexIndexTable.append(VertexIndex)
-
-            if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER12:
-                for i in range(Node.FaceCount):
-                    for j in range(3):
-                        FaceIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                        Node.FaceIndexTable.append(FaceIndex)  
-                Node.FaceIndexCount = Node.FaceCount * 3                  
-            else:
-                PrimitiveType = binaryreader.read_int(FileStream, 1)[0]
-                Node.FaceIndexCount = binaryreader.read_int(FileStream, 1)[0]
-                for i in range(Node.FaceIndexCount):
-                    FaceIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    Node.FaceIndexTable.append(FaceIndex)
-
-            Node.MaterialInfoCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.MaterialInfoCount):
-                MtrlTableInfo = datatypes.FMtrlTableInfo()
-                if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER9:
-                    MtrlTableInfo.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-                    MtrlTableInfo.Offset = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.Count = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.SubMaterialIDForDrawMasking = binaryreader.read_int(FileStream, 1)[0]
-                else:
-                    MtrlTableInfo.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-                    MtrlTableInfo.Offset = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.Count = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.SubMaterialIDForDrawMasking = binaryreader.read_int(FileStream, 1)[0]
-                Node.MaterialInfoTable.append(MtrlTableInfo)
-            
-            # @todo GetBipID
-            Node.BoundingBox.vmin = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-            Node.BoundingBox.vmax = datatypes.FVector(binaryreader.read_float(FileStream, 3))
+def calculate_bounding_box(Node):
+    Node.calculate_local_bounding_box()
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
 
+def validate_bounding_box(Node):
+    """
+    Checks the bounds stored in the file against the bounds of the points. A mismatch is logged, the stored bounds
+    are kept in StoredBoundingBox either way. Nodes without points (dummies, bones) are not checked.
+    """
+    if Node.PointsCount <= 0:
+        return
+    Node.BoundingBoxMatchesStored = Node.BoundingBox.matches(Node.StoredBoundingBox)
+    if not Node.BoundingBoxMatchesStored:
+        Message = "Node {0}: stored bounding box does not match its points".format(Node.NodeName)
+        filelogger.add_log(globalvars.LogFileStream, Message, filelogger.ELogMessageType.Log_Warning)
 
-class FEluNodeLoaderImpl_v16(FEluNodeLoaderImpl_v15):
-    
-    def __init__(self):
-        super().__init__()
-  
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            dwFVF = binaryreader.read_unsigned_int(FileStream, 1)[0]
-            LightMapID = binaryreader.read_int(FileStream, 1)[0]
-
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-                
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-            
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector4(binaryreader.read_float(FileStream, 4))
-                Node.TangentTanTable.append(Vec)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
-
-            LightMapTexCoordTableCount = binaryreader.read_int(FileStream, 1)[0]
-            FileStream.seek(FileStream.tell() + 3 * 4 * LightMapTexCoordTableCount)
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
 
+def flag_dummy_mesh(Node):
+    if Node.PointsCount == 0 or Node.FaceCount == 0:
+        Node.add_flag(raidflags.RM_FLAG_DUMMY_MESH)
 
-class FEluNodeLoaderImpl_v17(FEluNodeLoaderImpl_v16):
-    
-    def __init__(self):
-        super().__init__()
-        
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            dwFVF = binaryreader.read_unsigned_int(FileStream, 1)[0]
-            LightMapID = binaryreader.read_int(FileStream, 1)[0]
-
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-                
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-            
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector4(binaryreader.read_float(FileStream, 4))
-                Node.TangentTanTable.append(Vec)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+"""
+Layout of an elu node for every supported version.\n
+A node is stored as the sections in ELU_NODE_SECTIONS, one after another. Every section is a list of fields in the
+order they are stored in the file, see readplan. Supporting a new version only needs a new entry in ELU_NODE_SCHEMAS.
+"""
 
+ELU_NODE_SECTIONS = ('Name', 'Info', 'Vertex', 'Face', 'VertexInfo', 'Etc')
+
+# Sections that hold the node hierarchy and matrices, everything a skeleton needs
+ELU_SKELETON_SECTIONS = ('Name', 'Info')
+
+F32 = numpy.dtype('<f4')
+U16 = numpy.dtype('<u2')
+
+
+def _vector_table(CountAttr, Attr, Components=3, Convert=None):
+    return readplan.FTableField(CountAttr, Attr, F32, Components, Convert)
+
+
+NAME_V12 = [
+    readplan.FWordField('NodeName'),
+    readplan.FWordField('NodeParentName'),
+    readplan.FScalarField('ParentNodeID', 'i'),
+]
+
+NAME_V20 = [
+    readplan.FWordField('NodeName'),
+    readplan.FScalarField('ParentNodeID', 'i'),
+    readplan.FWordField('NodeParentName'),
+]
+
+INFO_V12 = [
+    readplan.FScalarField('dwFlag', 'I'),
+    readplan.FScalarField('MeshAlign', 'i', convert=datatypes.RMeshAlign),
+    readplan.FScalarField('LocalMatrix', 'f', 16, datatypes.FMatrix),
+    readplan.FScalarField('BaseVisibility', 'i'),
+]
+
+INFO_V20 = [
+    readplan.FScalarField('LocalMatrix', 'f', 16, datatypes.FMatrix),
+    readplan.FScalarField('BaseVisibility', 'f'),
+    readplan.FScalarField('dwFlag', 'I'),
+    readplan.FScalarField('MeshAlign', 'i', convert=datatypes.RMeshAlign),
+    readplan.FScalarField('LODProjectIndex', 'i'),
+]
+
+POINTS = [
+    _vector_table('PointsCount', 'Points'),
+    readplan.FHook(calculate_bounding_box, attrs=('BoundingBox',)),
+]
+
+NORMALS = [_vector_table('NormalsCount', 'Normals')]
+TANGENTS_V12 = [_vector_table('TangentTanCount', 'TangentTans', 3, pad_tangents)]
+TANGENTS_V16 = [_vector_table('TangentTanCount', 'TangentTans', 4)]
+BINORMALS = [_vector_table('TangentBinCount', 'TangentBins')]
+TEX_COORDS = [_vector_table('TexCoordCount', 'TexCoords')]
+TEX_COORDS_EXTRA = [_vector_table('TexCoordExtraCount', 'TexCoordsExtra')]
+
+# Unused data
+FVF = [readplan.FScalarField(None, 'I')]
+LIGHT_MAP_ID = [readplan.FScalarField(None, 'i')]
+LIGHT_MAP_TEX_COORDS = [readplan.FSkipTableField(3 * 4)]
+
+VERTEX_V12 = POINTS + NORMALS + TANGENTS_V12 + BINORMALS + TEX_COORDS
+VERTEX_V14 = FVF + VERTEX_V12
+VERTEX_V15 = FVF + LIGHT_MAP_ID + VERTEX_V12 + LIGHT_MAP_TEX_COORDS
+VERTEX_V16 = FVF + LIGHT_MAP_ID + POINTS + NORMALS + TANGENTS_V16 + BINORMALS + TEX_COORDS + LIGHT_MAP_TEX_COORDS
+VERTEX_V17 = FVF + LIGHT_MAP_ID + POINTS + NORMALS + TANGENTS_V16 + BINORMALS + TEX_COORDS
+VERTEX_V18 = POINTS + NORMALS + TANGENTS_V16 + BINORMALS + TEX_COORDS + TEX_COORDS_EXTRA
+VERTEX_V20 = POINTS + TEX_COORDS + TEX_COORDS_EXTRA + NORMALS + TANGENTS_V16 + BINORMALS
+
+POLYGON_ATTRS = ('PolygonOffsets', 'PolygonCorners', 'PolygonMaterialIDs')
+PHYSIQUE_ATTRS = ('PhysiqueData', 'PhysiqueSizes', 'PhysiqueNums')
+
+
+def _face_table(CornerDtype):
+    return readplan.FCustomField(functools.partial(read_faces, CornerDtype=CornerDtype),
+                                 functools.partial(skip_faces, CornerDtype=CornerDtype), POLYGON_ATTRS)
+
+
+FACE_V12 = [
+    readplan.FScalarField('FaceCount', 'i'),
+    _face_table(datatypes.FACE_SUB_DATA_DTYPE_V12),
+]
+
+FACE_V15 = [
+    readplan.FScalarField('FaceCount', 'i'),
+    _face_table(datatypes.FACE_SUB_DATA_DTYPE),
+]
+
+VERTEX_INFO = [
+    _vector_table('PointColorCount', 'PointColors'),
+    readplan.FScalarField('MaterialID', 'i'),
+    readplan.FScalarField('PhysiqueCount', 'i'),
+    readplan.FCustomField(read_physique, skip_physique, PHYSIQUE_ATTRS),
+    readplan.FHook(flag_dummy_mesh, run_on_skip=True),
+]
+
+BONES = [
+    readplan.FTableField('BoneCount', 'BoneTable', F32, 16, make_matrix_list),
+    readplan.FTableField('BoneCount', 'BoneTableIndices', U16, count_prefixed=False),
+]
+
+VERTEX_INDICES_V12 = [readplan.FTableField('VertexIndexCount', 'VertexIndices', datatypes.VERTEX_INDEX_DTYPE_V12)]
+VERTEX_INDICES_V15 = [readplan.FTableField('VertexIndexCount', 'VertexIndices', datatypes.VERTEX_INDEX_DTYPE)]
+PRIMITIVE_TYPE = [readplan.FScalarField(None, 'i')]
+FACE_INDICES = [readplan.FTableField('FaceIndexCount', 'FaceIndexTable', U16)]
+MATERIAL_INFOS = [readplan.FTableField('MaterialInfoCount', 'MaterialInfos', datatypes.MTRL_TABLE_INFO_DTYPE)]
+BOUNDING_BOX = [
+    readplan.FScalarField('StoredBoundingBox', 'f', 6, make_bounding_box),
+    readplan.FHook(validate_bounding_box, attrs=('BoundingBoxMatchesStored',)),
+]
+
+ETC_V12 = BONES + VERTEX_INDICES_V12 + PRIMITIVE_TYPE + FACE_INDICES + MATERIAL_INFOS
+ETC_V13 = ETC_V12 + BOUNDING_BOX
+ETC_V15 = BONES + VERTEX_INDICES_V15 + PRIMITIVE_TYPE + FACE_INDICES + MATERIAL_INFOS + BOUNDING_BOX
+ETC_V20 = PRIMITIVE_TYPE + VERTEX_INDICES_V15 + BONES + MATERIAL_INFOS + FACE_INDICES + BOUNDING_BOX
+
+ELU_NODE_SCHEMA_V12 = {'Name': NAME_V12, 'Info': INFO_V12, 'Vertex': VERTEX_V12, 'Face': FACE_V12,
+                       'VertexInfo': VERTEX_INFO, 'Etc': ETC_V12}
+
+ELU_NODE_SCHEMAS = {
+    raidflags.EXPORTER_MESH_VER12: ELU_NODE_SCHEMA_V12,
+    raidflags.EXPORTER_MESH_VER13: dict(ELU_NODE_SCHEMA_V12, Etc=ETC_V13),
+    raidflags.EXPORTER_MESH_VER14: dict(ELU_NODE_SCHEMA_V12, Vertex=VERTEX_V14, Etc=ETC_V13),
+    raidflags.EXPORTER_MESH_VER15: dict(ELU_NODE_SCHEMA_V12, Vertex=VERTEX_V15, Face=FACE_V15, Etc=ETC_V15),
+    raidflags.EXPORTER_MESH_VER16: dict(ELU_NODE_SCHEMA_V12, Vertex=VERTEX_V16, Face=FACE_V15, Etc=ETC_V15),
+    raidflags.EXPORTER_MESH_VER17: dict(ELU_NODE_SCHEMA_V12, Vertex=VERTEX_V17, Face=FACE_V15, Etc=ETC_V15),
+    raidflags.EXPORTER_MESH_VER18: dict(ELU_NODE_SCHEMA_V12, Vertex=VERTEX_V18, Face=FACE_V15, Etc=ETC_V15),
+    raidflags.EXPORTER_MESH_VER20: {'Name': NAME_V20, 'Info': INFO_V20, 'Vertex': VERTEX_V20, 'Face': FACE_V15,
+                                    'VertexInfo': VERTEX_INFO, 'Etc': ETC_V20},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_read_plans(Version):
+    """
+    Compiles the schema of Version into one read plan per section. Plans are compiled once per version.\n
+    @return Returns a dict of section name -> readplan.FReadPlan\n
+    """
+    Schema = ELU_NODE_SCHEMAS[Version]
+    return {Section: readplan.compile_read_plan(Schema[Section]) for Section in ELU_NODE_SECTIONS}
 
-class FEluNodeLoaderImpl_v18(FEluNodeLoaderImpl_v17):
-    
-    def __init__(self):
-        super().__init__()
 
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-                
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-            
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector4(binaryreader.read_float(FileStream, 4))
-                Node.TangentTanTable.append(Vec)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
-
-            Node.TexCoordExtraCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordExtraCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordExtraTable.append(Vec)
+class FEluNodeLoaderImpl():
+    """
+    Elu node loader, reads nodes with the compiled read plans of a single elu version
+    """
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+    def __init__(self, Context):
+        """
+        @param Context datatypes.FParseContext of the file that is parsed\n
+        """
+        self.Context = Context
+        self.Version = Context.Version
+        self.ReadPlans = get_read_plans(self.Version)
+        # Table attribute -> section it is stored in
+        self.TableSections = {Attr: Section for Section, Plan in self.ReadPlans.items() for Attr in Plan.table_attrs}
 
+    def Load(self, Node, FileStream, Offset=None):
+        """
+        This function reads data from FileStream and writes it to Node\n
+        @param Node EluNode that we need to write data to, from FileStream\n
+        @param FileStream Binary data stream. // Constant\n
+        @param Offset Cursor offset in FileStream. default=None, reads from the current offset.\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
+        for Section in ELU_NODE_SECTIONS:
+            self.LoadSection(Node, FileStream, Section)
 
-class FEluNodeLoaderImpl_v20(FEluNodeLoaderImpl_v18):
-    
-    def __init__(self):
-        super().__init__()
-        
-    def LoadName(self, Node, FileStream, Offset):
+    def LoadSection(self, Node, FileStream, Section, Offset=None):
         try:
-            Node.NodeName = binaryreader.read_word(FileStream)
-            Node.ParentNodeID = binaryreader.read_int(FileStream, 1)[0]
-            Node.NodeParentName = binaryreader.read_word(FileStream)
+            if Offset is not None:
+                FileStream.seek(Offset)
+            self.ReadPlans[Section].read(Node, FileStream)
         except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
-    
-    def LoadInfo(self, Node, FileStream, Offset):
-        try:
-            Node.LocalMatrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
+            errorhandling.handle_struct_unpack_error(err, self.Context, Node.NodeName, Section, FileStream.tell())
+        except errorhandling.ParseError as err:
+            err.set_context(self.Context.FilePath, Node.NodeName, Section)
+            raise
 
-            Node.BaseVisibility = binaryreader.read_float(FileStream, 1)[0]
-            Node.dwFlag = binaryreader.read_unsigned_int(FileStream, 1)[0]
+    def LoadSkeleton(self, Node, FileStream, Offset=None):
+        """
+        Reads only the sections in ELU_SKELETON_SECTIONS (names, parent, matrix, visibility) to Node.\n
+        Geometry sections are skipped over using their counts, their tables keep the FEluNode defaults.\n
+        @param Node EluNode that we need to write data to, from FileStream\n
+        @param FileStream Binary data stream. // Constant\n
+        @param Offset Cursor offset in FileStream. default=None, reads from the current offset.\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
+        for Section in ELU_NODE_SECTIONS:
             try:
-                Node.MeshAlign = datatypes.RMeshAlign(binaryreader.read_int(FileStream, 1)[0])
-            except ValueError as er:
-                Message = "Node.MeshAlign value is out of allowed range."
-                filelogger.add_log(globalvars.LogFileStream, Message, filelogger.ELogMessageType.Log_Warning)
-            Node.LODProjectIndex = binaryreader.read_int(FileStream, 1)[0]
+                if Section in ELU_SKELETON_SECTIONS:
+                    self.ReadPlans[Section].read(Node, FileStream)
+                else:
+                    self.ReadPlans[Section].skip(Node, FileStream)
+            except struct.error as err:
+                errorhandling.handle_struct_unpack_error(err, self.Context, Node.NodeName, Section, FileStream.tell())
+            except errorhandling.ParseError as err:
+                err.set_context(self.Context.FilePath, Node.NodeName, Section)
+                raise
+
+    def Index(self, Node, FileStream, Offset=None):
+        """
+        Reads the scalars and names of a node to Node and skips over its tables, see readplan.FReadPlan.skip()\n
+        Every count of the node is known afterwards, none of its tables are decoded.\n
+        @param Node EluNode that we need to write data to, from FileStream\n
+        @param FileStream Binary data stream. // Constant\n
+        @param Offset Cursor offset in FileStream. default=None, reads from the current offset.\n
+        @return Returns a dict of section name -> offset of the section in FileStream\n
+        """
+        if Offset is not None:
+            FileStream.seek(Offset)
+        SectionOffsets = {}
+        for Section in ELU_NODE_SECTIONS:
+            SectionOffsets[Section] = FileStream.tell()
+            try:
+                self.ReadPlans[Section].skip(Node, FileStream)
+            except struct.error as err:
+                errorhandling.handle_struct_unpack_error(err, self.Context, Node.NodeName, Section, FileStream.tell())
+            except errorhandling.ParseError as err:
+                err.set_context(self.Context.FilePath, Node.NodeName, Section)
+                raise
+        return SectionOffsets
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
 
-    def LoadVertex(self, Node, FileStream, Offset):
-        try:
-            Node.PointsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.PointsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.PointsTable.append(Vec)
-                
-            if Node.PointsCount:
-                Node.calculate_local_bounding_box()
-                
-            Node.TexCoordCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordTable.append(Vec)
-
-            Node.TexCoordExtraCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TexCoordExtraCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TexCoordExtraTable.append(Vec)
-            
-            Node.NormalsCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.NormalsCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.NormalsTable.append(Vec)
-            
-            Node.TangentTanCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentTanCount):
-                Vec = datatypes.FVector4(binaryreader.read_float(FileStream, 4))
-                Node.TangentTanTable.append(Vec)
-                
-            Node.TangentBinCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.TangentBinCount):
-                Vec = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-                Node.TangentBinTable.append(Vec)
+class FLazyEluNode(datatypes.FEluNode):
+    """
+    Elu node that is indexed on creation and decodes each section's tables from FileStream on first access.\n
+    Names, matrices, flags and all counts are available right away.\n
+    """
 
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+    def __init__(self, Loader, FileStream, Offset=None):
+        super().__init__()
+        self._loader = Loader
+        self._file_stream = FileStream
+        # Lazy attributes are removed from the instance, so that reading them ends up in __getattr__
+        self._defaults = {Attr: self.__dict__.pop(Attr) for Attr in Loader.TableSections}
+        self._pending_sections = set(Loader.TableSections.values())
+        self.SectionOffsets = Loader.Index(self, FileStream, Offset)
+
+    def __getattr__(self, Name):
+        # Only called for attributes that are not set, which are the tables of sections that are not decoded yet
+        Loader = self.__dict__.get('_loader')
+        if Loader is None or Name not in Loader.TableSections:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, Name))
+        self.load_section(Loader.TableSections[Name])
+        return self.__dict__[Name]
+
+    def load_section(self, Section) -> None:
+        """
+        Decodes the tables of Section, if they are not decoded yet\n
+        """
+        if Section not in self._pending_sections:
+            return
+        self._pending_sections.discard(Section)
+        for Attr, AttrSection in self._loader.TableSections.items():
+            if AttrSection == Section:
+                setattr(self, Attr, self._defaults[Attr])
 
-    def LoadEtc(self, Node, FileStream, Offset):
-        try:
-            PrimitiveType = binaryreader.read_int(FileStream, 1)[0]
-
-            Node.VertexIndexCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.VertexIndexCount):
-                VertexIndex = datatypes.FVertexIndex()
-                UnsignedShorts = binaryreader.read_unsigned_short(FileStream, 6)
-                VertexIndex.p = UnsignedShorts[0]
-                VertexIndex.n = UnsignedShorts[1]
-                VertexIndex.uv = UnsignedShorts[2]
-                VertexIndex.uv2 = UnsignedShorts[3]
-                VertexIndex.n_tan = UnsignedShorts[4]
-                VertexIndex.n_bin = UnsignedShorts[5]
-                Node.VertexIndexTable.append(VertexIndex)
-
-            Node.BoneCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.BoneCount):
-                Matrix = datatypes.FMatrix(binaryreader.read_float(FileStream, 16))
-                Node.BoneTable.append(Matrix)
-            
-            for i in range(Node.BoneCount):
-                BoneIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                Node.BoneTableIndices.append(BoneIndex)
-
-            Node.MaterialInfoCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.MaterialInfoCount):
-                MtrlTableInfo = datatypes.FMtrlTableInfo()
-                if globalvars.CurrentEluFileVersion < raidflags.EXPORTER_MESH_VER9:
-                    MtrlTableInfo.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-                    MtrlTableInfo.Offset = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.Count = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.SubMaterialIDForDrawMasking = binaryreader.read_int(FileStream, 1)[0]
-                else:
-                    MtrlTableInfo.MaterialID = binaryreader.read_int(FileStream, 1)[0]
-                    MtrlTableInfo.Offset = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.Count = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                    MtrlTableInfo.SubMaterialIDForDrawMasking = binaryreader.read_int(FileStream, 1)[0]
-                Node.MaterialInfoTable.append(MtrlTableInfo)
-            
-            Node.FaceIndexCount = binaryreader.read_int(FileStream, 1)[0]
-            for i in range(Node.FaceIndexCount):
-                FaceIndex = binaryreader.read_unsigned_short(FileStream, 1)[0]
-                Node.FaceIndexTable.append(FaceIndex)
-            
-            # @todo GetBipID
-            Node.BoundingBox.vmin = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-            Node.BoundingBox.vmax = datatypes.FVector(binaryreader.read_float(FileStream, 3))
-
-            # @todo fix bounding box
-        except struct.error as err:
-            errorhandling.handle_struct_unpack_error(err)
+        # The stream is shared with the mesh and other nodes, leave its cursor where it was
+        Position = self._file_stream.tell()
+        self._loader.LoadSection(self, self._file_stream, Section, self.SectionOffsets[Section])
+        self._file_stream.seek(Position)
+
+    def load_all(self) -> None:
+        for Section in ELU_NODE_SECTIONS:
+            self.load_section(Section)
+
+
+def create_node_loader(Context):
+    """
+    @param Context datatypes.FParseContext of the file that is parsed\n
+    @return Returns the node loader for the elu version of Context, None if the version is not supported\n
+    """
+    if Context.Version not in ELU_NODE_SCHEMAS:
+        return None
+    return FEluNodeLoaderImpl(Context)
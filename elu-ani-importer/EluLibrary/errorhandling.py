@@ -5,22 +5,131 @@
 # pylint: disable=W0614
 
 """
-This module contains methods to properly handle errors and close the program
+This module contains the errors raised while loading .elu and .ani files and methods to handle them
 """
 
+import enum
 import filelogger
 import globalvars
+import binaryreader
 
 
-def handle_struct_unpack_error(err):
-    message = "Struct Unpack Error"
-    filelogger.add_log(globalvars.LogFileStream, message, filelogger.ELogMessageType.Log_Error)
-    filelogger.close_log_file_stream(globalvars.LogFileStream, filelogger.LogStreamEndReason.ProgramError)
-    exit()
+class EErrorPolicy(enum.Enum):
+    """
+    What a batch driver does with a file that fails to load, see run_with_error_policy()
+    """
+    # Log the failure and go on with the next file
+    Skip = 0
+    # Try loading the file again, then skip it
+    Retry = 1
+    # Re-raise the error, ending the batch
+    Abort = 2
 
 
-def handle_assertion_error(err):
-    Message = err.args[0]
-    filelogger.add_log(globalvars.LogFileStream, Message, filelogger.ELogMessageType.Log_Error)
-    filelogger.close_log_file_stream(globalvars.LogFileStream, filelogger.LogStreamEndReason.ProgramError)
-    exit()
+class ParseError(Exception):
+    """
+    Base class of the errors raised while loading an elu or ani file. Carries the file, node and section the error
+    happened in, as far as they are known where it is raised.
+    """
+
+    def __init__(self, message, file_path=None, node_name=None, section=None, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.file_path = file_path
+        self.node_name = node_name
+        self.section = section
+        self.offset = offset
+
+    def set_context(self, file_path=None, node_name=None, section=None, offset=None):
+        """
+        Fills in the context that is not known yet, for handlers further up the call stack
+        """
+        self.file_path = self.file_path if self.file_path is not None else file_path
+        self.node_name = self.node_name if self.node_name is not None else node_name
+        self.section = self.section if self.section is not None else section
+        self.offset = self.offset if self.offset is not None else offset
+
+    def __str__(self):
+        context = [(name, value) for name, value in (('file', self.file_path), ('node', self.node_name),
+                                                     ('section', self.section), ('offset', self.offset))
+                   if value is not None]
+        if not context:
+            return self.message
+        return "{0} ({1})".format(self.message, ", ".join("{0}: {1}".format(name, value) for name, value in context))
+
+
+class TruncatedFileError(ParseError):
+    """
+    Raised when a file ends before the data its counts describe
+    """
+
+
+class InvalidFileError(ParseError):
+    """
+    Raised when the data of a file is inconsistent, like counts that do not match each other
+    """
+
+
+class FileTooLargeError(ParseError):
+    """
+    Raised by loaders given a memory budget when the estimated memory cost of a file goes over it
+    """
+
+    def __init__(self, file_path, estimated_size, memory_budget):
+        super().__init__("needs about {0:.1f} MB, over the memory budget of {1:.1f} MB".format(
+            estimated_size / 1024 ** 2, memory_budget / 1024 ** 2), file_path)
+        self.estimated_size = estimated_size
+        self.memory_budget = memory_budget
+
+
+def _get_file_path(context):
+    return getattr(context, 'FilePath', None)
+
+
+def handle_struct_unpack_error(err, context=None, node_name=None, section=None, offset=None):
+    """
+    Logs a struct unpack error and raises it again as TruncatedFileError, or as InvalidFileError if it was raised
+    for a negative table count (binaryreader.NegativeSizeError)\n
+    @param context datatypes.FParseContext of the file that is parsed\n
+    """
+    if isinstance(err, binaryreader.NegativeSizeError):
+        parse_error = InvalidFileError("Invalid Table Size: {0}".format(err), _get_file_path(context), node_name,
+                                       section, offset)
+    else:
+        parse_error = TruncatedFileError("Struct Unpack Error: {0}".format(err), _get_file_path(context), node_name,
+                                         section, offset)
+    filelogger.add_log(globalvars.LogFileStream, str(parse_error), filelogger.ELogMessageType.Log_Error)
+    raise parse_error from err
+
+
+def handle_assertion_error(err, context=None, node_name=None, section=None):
+    """
+    Logs a failed assertion and raises it again as InvalidFileError\n
+    @param context datatypes.FParseContext of the file that is parsed\n
+    """
+    parse_error = InvalidFileError(err.args[0], _get_file_path(context), node_name, section)
+    filelogger.add_log(globalvars.LogFileStream, str(parse_error), filelogger.ELogMessageType.Log_Error)
+    raise parse_error from err
+
+
+def run_with_error_policy(function, file_path, policy=EErrorPolicy.Skip, max_retries=1):
+    """
+    Calls function(), which loads file_path, and handles ParseError and OSError according to policy\n
+    @param function Callable that loads and processes file_path\n
+    @param file_path File loaded by function, used for logging\n
+    @param policy EErrorPolicy\n
+    @param max_retries Number of extra attempts with EErrorPolicy.Retry\n
+    @return Returns True if function() succeeded, False if the file was skipped\n
+    """
+    attempts = 1 + (max_retries if policy == EErrorPolicy.Retry else 0)
+    for attempt in range(attempts):
+        try:
+            function()
+            return True
+        except (ParseError, OSError) as err:
+            if policy == EErrorPolicy.Abort:
+                raise
+            message = "Failed to load {0} (attempt {1} of {2}): {3}".format(file_path, attempt + 1, attempts, err)
+            filelogger.add_log(globalvars.LogFileStream, message, filelogger.ELogMessageType.Log_Error)
+            print(message)
+    return False
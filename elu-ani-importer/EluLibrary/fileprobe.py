@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+"""
+This module contains functions to cheaply probe .elu and .ani files for their header and table counts, without
+loading them
+"""
+
+import os
+import enum
+import struct
+import binaryreader
+import eluparser
+import aniparser
+import datatypes
+import errorhandling
+from datatypes import EAnimationType
+
+
+# Bytes taken up by a single record of each elu node table once parsed, keyed by the count attribute of the table
+ELU_TABLE_RECORD_SIZES = {
+    'PointsCount': 12,
+    'NormalsCount': 12,
+    'TangentTanCount': 16,
+    'TangentBinCount': 12,
+    'TexCoordCount': 12,
+    'TexCoordExtraCount': 12,
+    'PointColorCount': 12,
+    'TotalDegrees': datatypes.FACE_SUB_DATA_DTYPE.itemsize,
+    # Polygon offset and material id
+    'FaceCount': 8,
+    # Up to three weights, plus the per-vertex size
+    'PhysiqueCount': 3 * datatypes.PHYSIQUE_SUB_DATA_DTYPE.itemsize + 8,
+    # Bone matrix and bone index
+    'BoneCount': 66,
+    'VertexIndexCount': datatypes.VERTEX_INDEX_DTYPE.itemsize,
+    'FaceIndexCount': 2,
+    'MaterialInfoCount': datatypes.MTRL_TABLE_INFO_DTYPE.itemsize,
+}
+# FEluNode object, names, matrices and small attributes
+ELU_NODE_OVERHEAD = 4096
+# Smallest key record of an ani file (frame and three half floats), used to bound the number of keys of a file
+MIN_ANI_KEY_RECORD_SIZE = 10
+# Parsed key: the largest record of datatypes.KEY_TRACK_DTYPES
+ANI_KEY_SIZE = datatypes.QUAT_KEY_DTYPE.itemsize
+
+_ELU_HEADER_STRUCT = struct.Struct('<IIii')
+_ANI_HEADER_STRUCT = struct.Struct('<IIiii')
+
+
+class EMemoryBudgetPolicy(enum.Enum):
+    """
+    What a loader does with a file whose estimated memory cost goes over its memory budget
+    """
+    # Load the file lazily or in a streaming mode, if the loader has one
+    SwitchToLazy = 0
+    # Raise errorhandling.FileTooLargeError
+    Raise = 1
+
+
+class FEluNodeProbe:
+    """
+    Names and counts of a single elu node. Filled in by the skip plans of eluparser, so attribute names are the same
+    as those of FEluNode (NodeName, PointsCount, FaceCount, BoneCount, ...).
+    """
+
+    def __init__(self) -> None:
+        # Offset of the node in the elu file
+        self.Offset: int = 0
+        self.NodeName: str = ''
+        self.NodeParentName: str = ''
+        self.ParentNodeID: int = -1
+        self.dwFlag: int = 0
+        self.PointsCount: int = 0
+        self.FaceCount: int = 0
+        self.TotalDegrees: int = 0
+        self.TotalTriangles: int = 0
+        self.PhysiqueCount: int = 0
+        self.BoneCount: int = 0
+
+    def add_flag(self, flag) -> None:
+        self.dwFlag |= flag
+
+
+class FEluProbe:
+
+    def __init__(self) -> None:
+        self.file_path: str = ''
+        self.signature: int = 0
+        self.version: int = 0
+        self.material_num: int = 0
+        self.mesh_num: int = 0
+        self.supported: bool = False
+        self.nodes: list[FEluNodeProbe] = []
+        # Offset right after the last node
+        self.end_offset: int = 0
+
+    @property
+    def point_count(self) -> int:
+        return sum(node.PointsCount for node in self.nodes)
+
+    @property
+    def face_count(self) -> int:
+        return sum(node.FaceCount for node in self.nodes)
+
+    @property
+    def bone_count(self) -> int:
+        return sum(node.BoneCount for node in self.nodes)
+
+    @property
+    def bounding_box(self):
+        """
+        Union of the bounds stored in the nodes (version 13 and later), None if the file stores no bounds. Read
+        without decoding any point, for spatial scheduling and culling.
+        """
+        stored_boxes = [node.StoredBoundingBox for node in self.nodes if hasattr(node, 'StoredBoundingBox')]
+        if not stored_boxes:
+            return None
+        bounding_box = datatypes.FBoundingBox()
+        for stored_box in stored_boxes:
+            bounding_box.merge(stored_box)
+        return bounding_box
+
+    def estimate_memory(self) -> int:
+        """
+        @return Returns the approximate number of bytes the parsed node tables take up, from the table counts\n
+        """
+        # Counts of tables a version does not have are never set on the probe
+        return estimate_elu_nodes_memory(vars(node) for node in self.nodes)
+
+
+class FAniProbe:
+
+    def __init__(self) -> None:
+        self.file_path: str = ''
+        self.signature: int = 0
+        self.version: int = 0
+        self.max_frame: int = 0
+        self.model_num: int = 0
+        self.ani_type = None
+
+
+def estimate_elu_nodes_memory(node_counts) -> int:
+    """
+    @param node_counts Iterable of one dict per node, holding count attribute name -> count. Missing counts are 0.\n
+    @return Returns the approximate number of bytes the parsed node tables take up\n
+    """
+    size = 0
+    for counts in node_counts:
+        size += ELU_NODE_OVERHEAD
+        for count_attr, record_size in ELU_TABLE_RECORD_SIZES.items():
+            size += max(0, counts.get(count_attr, 0)) * record_size
+    return size
+
+
+def probe_elu(file_path: str, with_nodes: bool = True) -> FEluProbe:
+    """
+    Reads the header of an elu file and, if with_nodes is set, the names and counts of its nodes.\n
+    Nodes are walked with the skip plans of eluparser, so no table is decoded and no FEluNode is built. The file is
+    memory mapped, only the pages holding counts are read from disk.\n
+    Raises errorhandling.TruncatedFileError if the file is truncated.\n
+    @param file_path Path of the elu file\n
+    @param with_nodes Walk the nodes as well. Only the header is read otherwise.\n
+    @return Returns the FEluProbe. nodes stays empty if the elu version is not supported.\n
+    """
+    probe = FEluProbe()
+    probe.file_path = file_path
+    with binaryreader.FBinaryCursor.from_file(file_path, use_mmap=True) as file_stream:
+        try:
+            probe.signature, probe.version, probe.material_num, probe.mesh_num = \
+                binaryreader.read_struct(file_stream, _ELU_HEADER_STRUCT)
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, datatypes.FParseContext(file_path), section='Header')
+        probe.supported = probe.version in eluparser.ELU_NODE_SCHEMAS
+        if not (with_nodes and probe.supported):
+            return probe
+
+        context = datatypes.FParseContext(file_path, probe.version)
+        read_plans = eluparser.get_read_plans(probe.version)
+        for _ in range(probe.mesh_num):
+            node = FEluNodeProbe()
+            node.Offset = file_stream.tell()
+            for section in eluparser.ELU_NODE_SECTIONS:
+                try:
+                    read_plans[section].skip(node, file_stream)
+                except struct.error as err:
+                    errorhandling.handle_struct_unpack_error(err, context, node.NodeName, section, file_stream.tell())
+            probe.nodes.append(node)
+        probe.end_offset = file_stream.tell()
+    return probe
+
+
+def probe_ani(file_path: str) -> FAniProbe:
+    """
+    Reads the header of an ani file (version, max frame, node count and animation type), nothing else.\n
+    Raises errorhandling.TruncatedFileError if the file is too short to hold a header.\n
+    """
+    probe = FAniProbe()
+    probe.file_path = file_path
+    with open(file_path, 'rb') as file_stream:
+        try:
+            probe.signature, probe.version, probe.max_frame, probe.model_num, ani_type = \
+                binaryreader.read_struct(file_stream, _ANI_HEADER_STRUCT)
+        except struct.error as err:
+            errorhandling.handle_struct_unpack_error(err, datatypes.FParseContext(file_path), section='Header')
+    try:
+        probe.ani_type = EAnimationType(ani_type)
+    except ValueError:
+        probe.ani_type = ani_type
+    return probe
+
+
+def estimate_elu_memory(file_path: str) -> int:
+    """
+    @return Returns the approximate number of bytes the parsed nodes of the elu file take up, see
+    FEluProbe.estimate_memory()\n
+    """
+    return probe_elu(file_path).estimate_memory()
+
+
+def estimate_ani_memory(file_path: str) -> int:
+    """
+    Ani key tracks are not counted ahead of parsing, the number of keys is bounded by the size of the file instead.
+    Vertex animations are decoded one to one from the file, except for the vertex tables that are memory mapped
+    (see aniparser.is_vertex_table_mapped()), which are not counted. Their nodes are walked to find those tables.\n
+    @return Returns an upper bound of the number of bytes the parsed ani file takes up\n
+    """
+    file_size = os.path.getsize(file_path)
+    probe = probe_ani(file_path)
+    if probe.ani_type != EAnimationType.RAniType_Vertex:
+        return file_size // MIN_ANI_KEY_RECORD_SIZE * ANI_KEY_SIZE
+
+    loader = aniparser.create_loader(datatypes.FParseContext(file_path, probe.version))
+    if loader is None:
+        return file_size
+    mapped_size = 0
+    with binaryreader.FBinaryCursor.from_file(file_path, use_mmap=True) as file_stream:
+        file_stream.seek(_ANI_HEADER_STRUCT.size)
+        for _ in range(probe.model_num):
+            node = datatypes.FAniNode()
+            loader.IndexVertexAni(node, file_stream)
+            loader.IndexVisibilityKey(node, file_stream)
+            shape = aniparser.get_vertex_table_shape(node)
+            if aniparser.is_vertex_table_mapped(shape):
+                mapped_size += shape[0] * shape[1] * shape[2] * 4
+    return file_size - mapped_size
+
+
+def is_bone_ani_file(file_path: str) -> bool:
+    """
+    @return Returns True if the ani file at file_path holds a bone animation. Vertex animations are not supported.\n
+    """
+    return probe_ani(file_path).ani_type == EAnimationType.RAniType_Bone
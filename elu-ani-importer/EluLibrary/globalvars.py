@@ -25,5 +25,3 @@ LogFileName += '.md'
 LogFileName = os.getcwd() + os.sep + 'logs' + os.sep + LogFileName
 
 LogFileStream = open(LogFileName, 'a+')
-CurrentEluFileVersion = 0
-CurrentAniFileVersion = 0
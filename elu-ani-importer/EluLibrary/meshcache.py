@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+"""
+This module contains a persistent on-disk cache of parsed .elu and .ani files.\n
+Entries are the results of batchparser (FEluParseResult/FAniParseResult) stored as uncompressed .npz files, one
+per source file. Node arrays are stored as they are, everything else goes into a small json blob. Entries are keyed
+by the source path, size and modification time (or, optionally, a hash of the file content) plus CACHE_VERSION, so
+editing a source file or changing the parser invalidates them.
+"""
+
+import os
+import json
+import hashlib
+import numpy
+import batchparser
+import commonfunctions
+
+
+# Bump whenever the parsers or the layout of parse results change, older entries are then never read again
+CACHE_VERSION = 2
+
+DEFAULT_MAX_CACHE_SIZE = 2 * 1024 ** 3
+
+_CACHE_FILE_EXTENSION = '.npz'
+_META_KEY = 'meta'
+
+
+def _to_json_value(value):
+    if isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError("{0} is not json serializable".format(type(value).__name__))
+
+
+def _from_json_value(value):
+    # json turns tuples into lists, parse results only ever hold tuples
+    if isinstance(value, list):
+        return tuple(_from_json_value(item) for item in value)
+    return value
+
+
+class FMeshCache:
+    """
+    Size-bounded cache directory of parsed meshes and animations. When the total size of the entries goes over
+    max_size, the least recently used entries are removed. Reading an entry marks it as used.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_CACHE_SIZE, use_content_hash: bool = False) -> None:
+        """
+        @param cache_dir Directory the entries are stored in, created if it does not exist\n
+        @param max_size Maximum total size of the entries, in bytes\n
+        @param use_content_hash Key entries by a hash of the file content instead of its modification time. Slower,
+        but survives tools that touch files without changing them.\n
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.use_content_hash = use_content_hash
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, file_path: str) -> str:
+        """
+        @return Returns the key of the current content of file_path\n
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        key = hashlib.sha1()
+        key.update("{0}|{1}|{2}|".format(CACHE_VERSION, file_path, stat.st_size).encode('utf-8'))
+        if self.use_content_hash:
+            with open(file_path, 'rb') as file_stream:
+                for block in iter(lambda: file_stream.read(1024 * 1024), b''):
+                    key.update(block)
+        else:
+            key.update(str(stat.st_mtime_ns).encode('utf-8'))
+        return key.hexdigest()
+
+    def get_entry_path(self, file_path: str) -> str:
+        return os.path.join(self.cache_dir, self.get_key(file_path) + _CACHE_FILE_EXTENSION)
+
+    def get(self, file_path: str):
+        """
+        @return Returns the cached FEluParseResult/FAniParseResult of file_path, or None if there is no valid entry\n
+        """
+        entry_path = self.get_entry_path(file_path)
+        try:
+            result = self._read_entry(entry_path, file_path)
+        except (OSError, ValueError, KeyError):
+            # Missing, stale or damaged entry
+            result = None
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Entry age is used for LRU eviction
+        os.utime(entry_path)
+        return result
+
+    def put(self, result) -> None:
+        """
+        Stores a parse result, results holding an error are not stored\n
+        """
+        if result.error is not None:
+            return
+        entry_path = self.get_entry_path(result.file_path)
+        meta = {key: value for key, value in vars(result).items() if key != 'nodes'}
+        meta['cache_version'] = CACHE_VERSION
+        meta['node_meta'] = []
+        arrays = {}
+        for index, node_data in enumerate(result.nodes):
+            node_meta = {}
+            for name, value in node_data.items():
+                if isinstance(value, numpy.ndarray):
+                    arrays['{0}.{1}'.format(index, name)] = value
+                else:
+                    node_meta[name] = value
+            meta['node_meta'].append(node_meta)
+        arrays[_META_KEY] = numpy.frombuffer(json.dumps(meta, default=_to_json_value).encode('utf-8'), numpy.uint8)
+
+        # Write to a temporary file first, so that an interrupted run never leaves a partial entry behind
+        temp_path = entry_path + '.tmp'
+        with open(temp_path, 'wb') as file_stream:
+            numpy.savez(file_stream, **arrays)
+        os.replace(temp_path, entry_path)
+        self.evict()
+
+    def load(self, file_path: str):
+        """
+        Returns the cached parse result of file_path, parsing the file and storing the result on a miss.\n
+        @return Returns a FEluParseResult or FAniParseResult, see batchparser.parse_file()\n
+        """
+        result = self.get(file_path)
+        if result is None:
+            result = self.refresh(file_path)
+        return result
+
+    def refresh(self, file_path: str):
+        """
+        Parses file_path and stores the result, replacing the entry of an older version of the file.\n
+        @return Returns a FEluParseResult or FAniParseResult, see batchparser.parse_file()\n
+        """
+        result = batchparser.parse_file(file_path)
+        self.put(result)
+        return result
+
+    def get_entries(self) -> list[tuple[str, int, float]]:
+        """
+        @return Returns (path, size, last use time) of every entry, least recently used first\n
+        """
+        entries = []
+        for dir_entry in os.scandir(self.cache_dir):
+            if not dir_entry.name.endswith(_CACHE_FILE_EXTENSION):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except OSError:
+                continue
+            entries.append((dir_entry.path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def get_size(self) -> int:
+        return sum(entry[1] for entry in self.get_entries())
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits in max_size\n
+        """
+        entries = self.get_entries()
+        cache_size = sum(entry[1] for entry in entries)
+        for entry_path, entry_size, _ in entries:
+            if cache_size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            cache_size -= entry_size
+
+    def clear(self) -> None:
+        for entry_path, _, _ in self.get_entries():
+            os.remove(entry_path)
+
+    def _read_entry(self, entry_path: str, file_path: str):
+        with numpy.load(entry_path, allow_pickle=False) as entry:
+            meta = json.loads(entry[_META_KEY].tobytes().decode('utf-8'))
+            if meta.pop('cache_version') != CACHE_VERSION:
+                return None
+            is_elu_file = commonfunctions.get_file_extension(file_path) == '.elu'
+            result = batchparser.FEluParseResult(file_path) if is_elu_file else batchparser.FAniParseResult(file_path)
+            node_meta_list = meta.pop('node_meta')
+            meta.pop('file_path')
+            for key, value in meta.items():
+                setattr(result, key, value)
+            arrays = {}
+            for name in entry.files:
+                if name != _META_KEY:
+                    index, array_name = name.split('.', 1)
+                    arrays.setdefault(int(index), {})[array_name] = entry[name]
+            for index, node_meta in enumerate(node_meta_list):
+                node_data = {name: _from_json_value(value) for name, value in node_meta.items()}
+                node_data.update(arrays.get(index, {}))
+                result.nodes.append(node_data)
+        return result
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# pylint: disable=C0111
+# pylint: disable=C0103
+# pylint: disable=W0703
+# pylint: disable=W0614
+
+"""
+This module contains the fields used to describe binary layouts declaratively and the compiler that turns a
+list of fields into a read plan.\n
+Every field can be read or skipped. Skipping still reads scalars and words, which are cheap and hold the table
+counts, but moves past table data without decoding it.
+"""
+
+import numpy
+import binaryreader
+import filelogger
+import globalvars
+
+
+class FScalarField:
+    """
+    Fixed-size field of count values of a single struct format character ('i', 'I', 'f', 'h', 'H').\n
+    attr is the attribute the value is written to, None for data that is read and dropped.\n
+    convert optionally turns the unpacked value (a tuple if count > 1) into the stored value. If it raises
+    ValueError, a warning is logged and the attribute keeps its current value.\n
+    """
+
+    def __init__(self, attr, format_char: str, count: int = 1, convert=None) -> None:
+        self.attr = attr
+        self.format_char = format_char
+        self.count = count
+        self.convert = convert
+
+
+class FWordField:
+    """
+    Length-prefixed string, see binaryreader.read_word()\n
+    """
+
+    def __init__(self, attr) -> None:
+        self.attr = attr
+
+    def read(self, target, file_stream) -> None:
+        setattr(target, self.attr, binaryreader.read_word(file_stream))
+
+    skip = read
+
+
+class FTableField:
+    """
+    Table of records of dtype, each made of components values, read with a single binaryreader.read_array().\n
+    The record count is stored in the int right before the table and written to count_attr. If count_prefixed is
+    False, the table has no count of its own and uses the value already stored in count_attr.\n
+    convert optionally turns the array into the stored value.\n
+    """
+
+    def __init__(self, count_attr: str, attr: str, dtype, components: int = 1, convert=None,
+                 count_prefixed: bool = True) -> None:
+        self.count_attr = count_attr
+        self.attr = attr
+        self.dtype = numpy.dtype(dtype)
+        self.components = components
+        self.convert = convert
+        self.count_prefixed = count_prefixed
+
+    def read(self, target, file_stream) -> None:
+        table = binaryreader.read_array(file_stream, self.dtype, getattr(target, self.count_attr), self.components)
+        if self.convert is not None:
+            table = self.convert(table)
+        setattr(target, self.attr, table)
+
+    def skip(self, target, file_stream) -> None:
+        count = getattr(target, self.count_attr)
+        binaryreader.skip_bytes(file_stream, count * self.components * self.dtype.itemsize)
+
+
+class FSkipTableField:
+    """
+    Count-prefixed table of record_size byte records that is not used by the importer and is skipped over\n
+    """
+
+    def __init__(self, record_size: int) -> None:
+        self.record_size = record_size
+
+    def read(self, target, file_stream) -> None:
+        count = binaryreader.read_int(file_stream, 1)[0]
+        binaryreader.skip_bytes(file_stream, count * self.record_size)
+
+    skip = read
+
+
+class FCustomField:
+    """
+    Data that needs its own reader, read_function(target, file_stream) reads it and writes attrs of target.\n
+    skip_function(target, file_stream) moves past the data and may only write scalars to target.\n
+    """
+
+    def __init__(self, read_function, skip_function, attrs=()) -> None:
+        self.read_function = read_function
+        self.skip_function = skip_function
+        self.attrs = tuple(attrs)
+
+    def read(self, target, file_stream) -> None:
+        self.read_function(target, file_stream)
+
+    def skip(self, target, file_stream) -> None:
+        self.skip_function(target, file_stream)
+
+
+class FHook:
+    """
+    Calls function(target) once every field before it has been read. Does not read any data.\n
+    Hooks that only depend on scalar fields can set run_on_skip to be called when the fields are skipped as well.\n
+    attrs are the attributes written by hooks that depend on tables, handled like table attributes.\n
+    """
+
+    def __init__(self, function, run_on_skip: bool = False, attrs=()) -> None:
+        self.function = function
+        self.run_on_skip = run_on_skip
+        self.attrs = tuple(attrs)
+
+    def read(self, target, file_stream) -> None:
+        self.function(target)
+
+    def skip(self, target, file_stream) -> None:
+        if self.run_on_skip:
+            self.function(target)
+
+
+class FFusedScalarRead:
+    """
+    Reads a run of adjacent scalar fields with a single struct unpack and assigns the results\n
+    """
+
+    def __init__(self, fields, endian: str = '<') -> None:
+        format_string = endian
+        self.assignments = []
+        position = 0
+        for field in fields:
+            format_string += str(field.count) + field.format_char
+            if field.attr is not None:
+                self.assignments.append((field.attr, position, field.count, field.convert))
+            position += field.count
+        self.fmt_struct = binaryreader.get_format_struct(format_string)
+
+    def read(self, target, file_stream) -> None:
+        values = binaryreader.read_struct(file_stream, self.fmt_struct)
+        for attr, position, count, convert in self.assignments:
+            value = values[position] if count == 1 else values[position:position + count]
+            if convert is not None:
+                try:
+                    value = convert(value)
+                except ValueError:
+                    message = "Node.{0} value is out of allowed range.".format(attr)
+                    filelogger.add_log(globalvars.LogFileStream, message, filelogger.ELogMessageType.Log_Warning)
+                    continue
+            setattr(target, attr, value)
+
+    skip = read
+
+
+class FReadPlan:
+    """
+    Compiled form of a list of fields, see compile_read_plan()\n
+    """
+
+    def __init__(self, steps, skip_steps, table_attrs) -> None:
+        self.steps = tuple(steps)
+        self.skip_steps = tuple(skip_steps)
+        # Attributes that are only written by read(), not by skip()
+        self.table_attrs = tuple(table_attrs)
+
+    def read(self, target, file_stream) -> None:
+        """
+        Reads the fields of the plan from file_stream, starting at its current offset, and writes them to target\n
+        """
+        for step in self.steps:
+            step(target, file_stream)
+
+    def skip(self, target, file_stream) -> None:
+        """
+        Moves file_stream past the fields of the plan. Scalars and words are still written to target, tables are not.\n
+        """
+        for step in self.skip_steps:
+            step(target, file_stream)
+
+
+def compile_read_plan(fields, endian: str = '<') -> FReadPlan:
+    """
+    Compiles a list of fields into a read plan.\n
+    Adjacent scalar fields, including the counts of count-prefixed tables that follow them, are merged into a
+    single unpack, and every table is read in bulk.\n
+    @param fields List of F*Field/FHook objects, in the order they are stored in the file\n
+    @param endian little or big endian method to use for struct unpacking\n
+    @return Returns the FReadPlan\n
+    """
+    steps = []
+    skip_steps = []
+    table_attrs = []
+    scalars = []
+
+    def add_step(step):
+        steps.append(step.read)
+        skip_steps.append(step.skip)
+
+    def flush_scalars():
+        if scalars:
+            add_step(FFusedScalarRead(list(scalars), endian))
+            scalars.clear()
+
+    for field in fields:
+        if isinstance(field, FScalarField):
+            scalars.append(field)
+            continue
+        if isinstance(field, FTableField):
+            table_attrs.append(field.attr)
+            if field.count_prefixed:
+                scalars.append(FScalarField(field.count_attr, 'i'))
+        elif isinstance(field, (FCustomField, FHook)):
+            table_attrs.extend(field.attrs)
+        flush_scalars()
+        add_step(field)
+    flush_scalars()
+    return FReadPlan(steps, skip_steps, table_attrs)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+* Memory benchmark of the per-record datatypes (faces, vertices and keyframes)
+* Run with plain python, outside of blender:
+*   python benchmark_memory.py [file.elu|file.ani ...]
+* Without arguments, only synthetic records are measured. With elu/ani files, the records of those files are
+* materialized as objects (the same way blenderfunctions reads them) and measured as well.
+"""
+
+import os
+import sys
+import tracemalloc
+
+main_folder = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(main_folder + os.sep + "EluLibrary")
+
+# globalvars opens its log file in ./logs on import
+os.makedirs("logs", exist_ok=True)
+
+import datatypes
+from elumesh import FEluMesh
+from animesh import FAniMesh
+
+NUM_OF_RECORDS = 100000
+
+
+def measure(make_objects):
+    """
+    Returns the number of bytes still allocated by the objects make_objects() returns
+    """
+    tracemalloc.start()
+    objects = make_objects()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def make_faces():
+    # Triangles, as FPolygonTableView builds them
+    faces = []
+    for _ in range(NUM_OF_RECORDS):
+        polygon = datatypes.FMeshPolygonData()
+        polygon.Vertices = 3
+        polygon.FaceSubDatas = [datatypes.FFaceSubData() for _ in range(3)]
+        faces.append(polygon)
+    return faces
+
+
+def make_vertices():
+    # Position, normal, uv, tangent, one skin weight and the vertex index record of a vertex
+    return [(datatypes.FVector((0.0, 0.0, 0.0)), datatypes.FVector((0.0, 0.0, 1.0)),
+             datatypes.FVector((0.0, 0.0, 0.0)), datatypes.FVector4((1.0, 0.0, 0.0, 1.0)),
+             datatypes.FPhysiqueSubData(), datatypes.FVertexIndex()) for _ in range(NUM_OF_RECORDS)]
+
+
+def make_keyframes():
+    # Position, rotation and visibility key
+    keys = []
+    for _ in range(NUM_OF_RECORDS):
+        position_key = datatypes.FVecKey()
+        position_key.Vector = datatypes.FVector((0.0, 0.0, 0.0))
+        rotation_key = datatypes.FQuatKey()
+        rotation_key.Quat = datatypes.FQuaternion((0.0, 0.0, 0.0, 1.0))
+        keys.append((position_key, rotation_key, datatypes.FVisKey()))
+    return keys
+
+
+def make_matrices():
+    return [datatypes.FMatrix((0.0,) * 16) for _ in range(NUM_OF_RECORDS)]
+
+
+def benchmark_synthetic():
+    print("Synthetic records ({0} of each):".format(NUM_OF_RECORDS))
+    for name, make_objects in (("face (triangle)", make_faces), ("vertex", make_vertices),
+                               ("keyframe (pos + rot + vis)", make_keyframes), ("matrix", make_matrices)):
+        print("  {0:28} {1:8.1f} bytes".format(name, measure(make_objects) / NUM_OF_RECORDS))
+
+
+def benchmark_elu_file(file_path):
+    elu_mesh = FEluMesh(file_path)
+    nodes = elu_mesh.EluMeshNodes
+    num_of_faces = sum(node.FaceCount for node in nodes)
+    num_of_vertices = sum(node.PointsCount for node in nodes)
+    face_size = measure(lambda: [list(node.PolygonTable) for node in nodes])
+    vertex_size = measure(lambda: [(list(node.PointsTable), list(node.NormalsTable), list(node.TexCoordTable),
+                                    list(node.TangentTanTable), list(node.PhysiqueTable),
+                                    list(node.VertexIndexTable)) for node in nodes])
+    print("  {0}: {1:.1f} bytes per face, {2:.1f} bytes per vertex".format(
+        os.path.basename(file_path), face_size / max(num_of_faces, 1), vertex_size / max(num_of_vertices, 1)))
+
+
+def benchmark_ani_file(file_path):
+    tracemalloc.start()
+    ani_mesh = FAniMesh(file_path)
+    ani_mesh.load_and_parse_ani_file()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    num_of_keys = sum(track.Count for node in ani_mesh._ani_mesh_nodes
+                      for track in (node.PositionKeyTrack, node.RotationKeyTrack, node.ScaleKeyTrack,
+                                    node.VisKeyTrack))
+    print("  {0}: {1:.1f} bytes per keyframe".format(os.path.basename(file_path), size / max(num_of_keys, 1)))
+
+
+def main(file_paths):
+    benchmark_synthetic()
+    if file_paths:
+        print("Files:")
+    for file_path in file_paths:
+        if file_path.lower().endswith(".elu"):
+            benchmark_elu_file(file_path)
+        elif file_path.lower().endswith(".ani"):
+            benchmark_ani_file(file_path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
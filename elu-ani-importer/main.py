@@ -29,9 +29,13 @@ sys.path.append(main_folder + "EluLibrary")
 
 import enum
 import globalvars
+import filelogger
+import errorhandling
 import filedatatypes
 import commonfunctions
 import blenderfunctions
+import fileprobe
+import meshcache
 from elumesh import FEluMesh
 
 
@@ -61,6 +65,27 @@ SELECTIVE_EXPORT_KEYSTRING = "arek"
 SourceDir = r"D:\DarkRaidAssets\asset_src"
 # SET DestinationDir TO WHERE YOU WOULD LIKE TO EXPORT FBX FILES. DON'T LEAVE IT NONE
 DestinationDir = r"D:\DarkRaidAssets\asset_dest_2"
+# SET ParsedMeshCacheDir TO KEEP PARSED ELU AND ANI FILES BETWEEN RUNS. None DISABLES THE CACHE
+ParsedMeshCacheDir = None
+ParsedMeshCacheSize = meshcache.DEFAULT_MAX_CACHE_SIZE
+# Elu files whose parsed tables would take up more memory than EluMemoryBudget (in bytes) are logged and skipped.
+# Regular models stay far below it, the MapObject test files named like test_50call_50node_300000face.elu go over it.
+# Animations over AniMemoryBudget are loaded lazily instead.
+EluMemoryBudget = 24 * 1024 ** 2
+AniMemoryBudget = 512 * 1024 ** 2
+# WHAT TO DO WITH MODELS THAT FAIL TO LOAD (Skip, Retry OR Abort). Failed models are listed in Logs/FailedFiles.txt and
+# are not added to RecordFile.txt, so the next mass export tries them again.
+ErrorPolicy = errorhandling.EErrorPolicy.Skip
+ErrorRetries = 1
+# Normalize animation rotation keys and flip keys into the hemisphere of the previous key, so that blender does not
+# interpolate the long way around between them
+NormalizeAniRotations = False
+# Decode the key tracks of an animation bone only when the bone is exported. Bones missing from the model skeleton
+# (faces, weapons and other partial skeletons) are then never decoded. Animations read from ParsedMeshCache are always
+# fully decoded.
+LazyAniLoading = True
+
+ParsedMeshCache = meshcache.FMeshCache(ParsedMeshCacheDir, ParsedMeshCacheSize) if ParsedMeshCacheDir else None
 
 
 def get_recordfile():
@@ -74,10 +99,61 @@ def get_recordfile():
     return RecordFileStream
 
 
+def record_failed_file(file_path):
+    LogDirectory = os.getcwd() + os.sep + "Logs"
+    os.makedirs(LogDirectory, exist_ok=True)
+    with open(LogDirectory + os.sep + "FailedFiles.txt", 'a+') as FailedFileStream:
+        FailedFileStream.write(file_path + "\n")
+
+
+def process_raider_file(process_function, raider_file_obj, ani_file_paths):
+    """
+    Runs process_function on raider_file_obj under ErrorPolicy.
+    Returns True if the model was processed, False if it failed and was skipped.
+    """
+    succeeded = errorhandling.run_with_error_policy(lambda: process_function(raider_file_obj, ani_file_paths),
+                                                    raider_file_obj.elu_file, ErrorPolicy, ErrorRetries)
+    if not succeeded:
+        record_failed_file(raider_file_obj.elu_file)
+    return succeeded
+
+
+def load_elu_mesh(elu_file):
+    """
+    Loads elu_file, from ParsedMeshCache if it is set and holds a valid entry.
+    Returns None for files over EluMemoryBudget, which are logged and skipped.
+    """
+    try:
+        if ParsedMeshCache is None:
+            return FEluMesh(elu_file, memory_budget=EluMemoryBudget,
+                            over_budget_policy=fileprobe.EMemoryBudgetPolicy.Raise)
+        result = ParsedMeshCache.get(elu_file)
+        # Cached entries hold the table counts, the source file is only probed on a miss
+        if result is not None:
+            estimated_size = result.estimate_memory()
+        else:
+            estimated_size = fileprobe.estimate_elu_memory(elu_file)
+        if estimated_size > EluMemoryBudget:
+            raise errorhandling.FileTooLargeError(elu_file, estimated_size, EluMemoryBudget)
+    except errorhandling.FileTooLargeError as err:
+        print("Skipping:", err)
+        filelogger.add_log(globalvars.LogFileStream, "Skipped " + str(err), filelogger.ELogMessageType.Log_Warning)
+        return None
+
+    if result is None:
+        result = ParsedMeshCache.refresh(elu_file)
+    if result.error is not None:
+        # Parse the file again so that errors are reported the same way as without the cache
+        return FEluMesh(elu_file)
+    return FEluMesh.from_parse_result(result)
+
+
 def process_static_or_skeletal_elumodel(RaiderFileObj, AniFilePaths):
     print("\nProcessing:", RaiderFileObj.elu_file)
+    EluMeshObj = load_elu_mesh(RaiderFileObj.elu_file)
+    if EluMeshObj is None:
+        return
     blenderfunctions.clear_blender()
-    EluMeshObj = FEluMesh(RaiderFileObj.elu_file)
     blenderfunctions.draw_elu_skeleton(EluMeshObj)
     blender_materials = blenderfunctions.create_materials(RaiderFileObj.materials_list)
     blenderfunctions.draw_elu_mesh(EluMeshObj, blender_materials)
@@ -97,8 +173,10 @@ def process_static_or_skeletal_elumodel(RaiderFileObj, AniFilePaths):
 
 def process_only_skeletal_elumodel(raider_file_obj, ani_file_paths):
     print("\nProcessing:", raider_file_obj.elu_file)
+    elu_mesh_obj = load_elu_mesh(raider_file_obj.elu_file)
+    if elu_mesh_obj is None:
+        return
     blenderfunctions.clear_blender()
-    elu_mesh_obj = FEluMesh(raider_file_obj.elu_file)
     blenderfunctions.draw_elu_skeleton(elu_mesh_obj)
     blender_materials = blenderfunctions.create_materials(raider_file_obj.materials_list)
     blenderfunctions.draw_elu_mesh(elu_mesh_obj, blender_materials)
@@ -118,8 +196,10 @@ def process_only_skeletal_elumodel(raider_file_obj, ani_file_paths):
 
 def process_modular_skeletal_elumodel(RaiderFileObj, AniFilePaths):
     print("\nProcessing:", RaiderFileObj.elu_file)
+    EluMeshObj = load_elu_mesh(RaiderFileObj.elu_file)
+    if EluMeshObj is None:
+        return
     blenderfunctions.clear_blender()
-    EluMeshObj = FEluMesh(RaiderFileObj.elu_file)
     blenderfunctions.draw_elu_skeleton(EluMeshObj)
     blender_materials = blenderfunctions.create_materials(RaiderFileObj.materials_list)
     blenderfunctions.draw_elu_mesh(EluMeshObj, blender_materials)
@@ -138,6 +218,10 @@ def process_modular_skeletal_elumodel(RaiderFileObj, AniFilePaths):
 
 
 def main(record_file_stream):
+    blenderfunctions.AniMeshCache.memory_budget = AniMemoryBudget
+    blenderfunctions.AniMeshCache.normalize_rotations = NormalizeAniRotations
+    blenderfunctions.AniMeshCache.lazy = LazyAniLoading
+    blenderfunctions.AniMeshCache.parsed_mesh_cache = ParsedMeshCache
     record_file_list = record_file_stream.read().split('\n')
 
     raider_files_manager = filedatatypes.FRaiderFilesManager(SourceDir, DestinationDir)
@@ -168,10 +252,10 @@ def main(record_file_stream):
                 MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.SFX:
             for RaiderObj in raider_obj_generator:
                 if RaiderObj.elu_xml_file not in record_file_list:
-                    process_static_or_skeletal_elumodel(RaiderObj, ani_file_paths)
-                    record_file_list.append(RaiderObj.elu_xml_file)
-                    record_file_stream.write(RaiderObj.elu_xml_file + "\n")
-                    record_file_stream.flush()
+                    if process_raider_file(process_static_or_skeletal_elumodel, RaiderObj, ani_file_paths):
+                        record_file_list.append(RaiderObj.elu_xml_file)
+                        record_file_stream.write(RaiderObj.elu_xml_file + "\n")
+                        record_file_stream.flush()
                 else:
                     continue
 
@@ -181,10 +265,10 @@ def main(record_file_stream):
                 MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.Ride:
             for RaiderObj in raider_obj_generator:
                 if RaiderObj.elu_xml_file not in record_file_list:
-                    process_only_skeletal_elumodel(RaiderObj, ani_file_paths)
-                    record_file_list.append(RaiderObj.elu_xml_file)
-                    record_file_stream.write(RaiderObj.elu_xml_file + "\n")
-                    record_file_stream.flush()
+                    if process_raider_file(process_only_skeletal_elumodel, RaiderObj, ani_file_paths):
+                        record_file_list.append(RaiderObj.elu_xml_file)
+                        record_file_stream.write(RaiderObj.elu_xml_file + "\n")
+                        record_file_stream.flush()
                 else:
                     continue
 
@@ -193,12 +277,13 @@ def main(record_file_stream):
             for RaiderObj in raider_obj_generator:
                 if RaiderObj.elu_xml_file not in record_file_list:
                     if "hf_face_" in RaiderObj.elu_xml_file or "hm_face_" in RaiderObj.elu_xml_file:
-                        process_only_skeletal_elumodel(RaiderObj, ani_file_paths)
+                        process_function = process_only_skeletal_elumodel
                     else:
-                        process_modular_skeletal_elumodel(RaiderObj, ani_file_paths)
-                    record_file_list.append(RaiderObj.elu_xml_file)
-                    record_file_stream.write(RaiderObj.elu_xml_file + "\n")
-                    record_file_stream.flush()
+                        process_function = process_modular_skeletal_elumodel
+                    if process_raider_file(process_function, RaiderObj, ani_file_paths):
+                        record_file_list.append(RaiderObj.elu_xml_file)
+                        record_file_stream.write(RaiderObj.elu_xml_file + "\n")
+                        record_file_stream.flush()
                 else:
                     continue
 
@@ -227,7 +312,7 @@ def main(record_file_stream):
                 MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.SFX:
             for RaiderObj in raider_obj_generator:
                 if SELECTIVE_EXPORT_KEYSTRING in RaiderObj.elu_file:
-                    process_static_or_skeletal_elumodel(RaiderObj, ani_file_paths)
+                    process_raider_file(process_static_or_skeletal_elumodel, RaiderObj, ani_file_paths)
 
         if MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.Weapon or \
                 MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.NPC or \
@@ -235,17 +320,18 @@ def main(record_file_stream):
                 MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.Ride:
             for RaiderObj in raider_obj_generator:
                 if SELECTIVE_EXPORT_KEYSTRING in RaiderObj.elu_file:
-                    process_only_skeletal_elumodel(RaiderObj, ani_file_paths)
+                    process_raider_file(process_only_skeletal_elumodel, RaiderObj, ani_file_paths)
 
         if MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.Male or \
                 MODEL_FOLDER_TO_EXPORT == ERaiderZModelFolder.Female:
             for RaiderObj in raider_obj_generator:
                 if SELECTIVE_EXPORT_KEYSTRING in RaiderObj.elu_file:
                     if "hf_face_" in RaiderObj.elu_xml_file or "hm_face_" in RaiderObj.elu_xml_file:
-                        process_only_skeletal_elumodel(RaiderObj, ani_file_paths)
+                        process_raider_file(process_only_skeletal_elumodel, RaiderObj, ani_file_paths)
                     else:
-                        process_modular_skeletal_elumodel(RaiderObj, ani_file_paths)
+                        process_raider_file(process_modular_skeletal_elumodel, RaiderObj, ani_file_paths)
     print("Export finished!")
+    print("Animation cache:", blenderfunctions.AniMeshCache.get_stats())
 
 
 if __name__ == "__main__":